@@ -3,12 +3,22 @@ from m5.objects import *
 
 class All2AllNetwork(GarnetNetwork):
 
-    def __init__(self, ruby_system, flit_size: int = 4):
+    def __init__(
+        self,
+        ruby_system,
+        flit_size: int = 4,
+        vcs_per_vnet: int = 4,
+        buffers_per_data_vc: int = 4,
+        buffers_per_ctrl_vc: int = 1
+    ):
         super().__init__()
         self.ruby_system = ruby_system
 
         # set network bandwidth and latency parameters
         self.ni_flit_size = flit_size
+        self.vcs_per_vnet = vcs_per_vnet
+        self.buffers_per_data_vc = buffers_per_data_vc
+        self.buffers_per_ctrl_vc = buffers_per_ctrl_vc
         self.ext_links = []
         self.int_links = []
         self.routers = []
@@ -6,12 +6,20 @@ class MeshNetwork(GarnetNetwork):
     def __init__(
         self, 
         ruby_system,
-        flit_size: int = 4
+        flit_size: int = 4,
+        vcs_per_vnet: int = 4,
+        buffers_per_data_vc: int = 4,
+        buffers_per_ctrl_vc: int = 1
     ):
         super().__init__()
         self.ruby_system = ruby_system
         self.ni_flit_size = flit_size
 
+        # router buffering: virtual channels per vnet and flit buffers per VC
+        self.vcs_per_vnet = vcs_per_vnet
+        self.buffers_per_data_vc = buffers_per_data_vc
+        self.buffers_per_ctrl_vc = buffers_per_ctrl_vc
+
     def connectControllers(
         self, 
         controllers,
@@ -1,119 +1,192 @@
 import os
 import re
 import csv
+import mmap
 import argparse
 import sys
 from env import *
 import datetime
+from metrics import get_metric_plan
+from energy import estimate_energy, load_coefficients
+from archive import is_archived, is_stats_name, list_bundle, member_name, open_stats, strip_compression
+
+# 文件名中的配置字段: (列名, 类型, 默认值)，顺序就是文件名中的顺序
+# 新字段只能追加在末尾，旧文件名中缺少的字段取默认值
+CONFIG_FIELDS = [
+    ("Application", str, None),
+    ("CPU_Num", int, None),
+    ("Cacheline_Size_Bytes", int, None),
+    ("Cachesize_kB", int, None),
+    ("Network_Topology", str, None),
+    ("Network_Flit_Size", int, None),
+    ("Network_Hop_Latency", int, None),
+    ("Network_VCs_Per_VNet", int, 4),
+    ("Network_Buffers_Per_Data_VC", int, 4),
+    ("Network_Buffers_Per_Ctrl_VC", int, 1),
+    ("CPU_Type", str, "o3"),
+    # 同一配置的第几次重复运行 (0 为不加扰动的基准运行)
+    ("Repetition", int, 0),
+]
+
+def format_config_name(params):
+    """
+    由配置参数生成文件名中的配置部分 (parse_filename 的逆过程)
+    例如: FFT-4-64-16-mesh-16-1-4-4-1-o3-0
+    """
+    values = []
+    for name, _, default in CONFIG_FIELDS:
+        value = params.get(name, default)
+        if value is None:
+            raise ValueError(f"missing config field: {name}")
+        values.append(str(value))
+    return "-".join(values)
+
+def format_synthetic_name(topology, nodes, pattern, hop_latency, injection_rate):
+    """
+    合成流量实验的统计文件名 (synthetic.py 与 simulate_synthetic.py 共用)
+    例如: synth-mesh-16-uniform_random-1-0.100.txt
+    """
+    return "-".join(["synth", topology, str(nodes), pattern, str(hop_latency), f"{injection_rate:.3f}"]) + ".txt"
+
+def elastic_trace_dir(application, cpu_num):
+    """
+    main.py --capture-trace 记录的 elastic trace 目录
+    访存流只取决于程序和线程数，同一份 trace 可用于所有缓存大小/缓存行大小的回放
+    """
+    return os.path.join(GENERATED_DIR, f"etrace-{application}-{cpu_num}")
 
 def parse_filename(filename):
     """
     从文件名解析参数信息
-    格式: stats-<application>-<cpu_num>-<cacheline_size_bytes>-<cache_size_kB>-<network_topology>-<network_flit_size>-<network_hop_latency>.txt
+    格式: stats-<application>-<cpu_num>-<cacheline_size_bytes>-<cache_size_kB>-<network_topology>-<network_flit_size>-<network_hop_latency>
+          [-<vcs_per_vnet>-<buffers_per_data_vc>-<buffers_per_ctrl_vc>[-<cpu_type>[-<repetition>]]].txt
+    压缩后的 .txt.gz / .txt.zst 以及归档成员 <bundle>.tar::<member> 同样适用
     """
     # 移除文件扩展名
-    basename = os.path.basename(filename).replace('.txt', '')
+    basename = strip_compression(member_name(filename)).replace('.txt', '')
     
     # 按连字符分割
     parts = basename.split('-')
     
-    if len(parts) < 7:
+    if len(parts) < 8:
         print(f"Warning: Unexpected filename format: {filename}")
         return {}
     
     try:
-        params = {
-            "Application": parts[1],
-            "CPU_Num": int(parts[2]),
-            "Cacheline_Size_Bytes": int(parts[3]),
-            "Cachesize_kB": int(parts[4]),
-            "Network_Topology": parts[5],
-            "Network_Flit_Size": int(parts[6]),
-            "Network_Hop_Latency": int(parts[7])
-        }
+        params = {}
+        for i, (name, convert, default) in enumerate(CONFIG_FIELDS):
+            if i + 1 < len(parts):
+                params[name] = convert(parts[i + 1])
+            elif default is not None:
+                params[name] = default
+            else:
+                raise IndexError(f"missing field {name}")
         return params
     except (ValueError, IndexError) as e:
         print(f"Error parsing filename {filename}: {e}")
         return {}
 
-def get_advanced_patterns():
-    """
-    定义高级统计指标的正则表达式
-    """
-    return {
-        # --- 基础概览 ---
-        "SimSeconds": r"simSeconds\s+([0-9\.e\-\+]+)",
-        "Total_Insts": r"simInsts\s+(\d+)",
-        "AvgIPC": r"system\.cpu[\d]*\.ipc\s+([0-9\.e\-\+]+)", 
-        "cycles": r"system\.cpu[\d]*\.numCycles\s+([0-9\.e\-\+]+)", 
-        
-        # --- 关键一致性事件 (Coherence Events) ---
-        # FwdGetM: 其他核想写，请求转发给拥有者 -> 意味着写竞争 (True Sharing / False Sharing)
-        "Coh_FwdGetM (Write Contention)": r"system\.ruby\.L1Cache_Controller\.FwdGetM::total\s+(\d+)",
-        # FwdGetS: 其他核想读，请求转发 -> 意味着读共享
-        "Coh_FwdGetS (Read Sharing)": r"system\.ruby\.L1Cache_Controller\.FwdGetS::total\s+(\d+)",
-        # Inv: 失效消息 -> 意味着有人在写共享数据
-        "Coh_Invalidations": r"system\.ruby\.L1Cache_Controller\.Inv::total\s+(\d+)",
-        # Writebacks: 数据写回下级缓存
-        "Coh_Writebacks (PutAck)": r"system\.ruby\.L1Cache_Controller\.PutAck::total\s+(\d+)",
-        # Locked RMW: 原子指令导致的锁操作 (通常是性能杀手)
-        "Coh_Locked_RMW": r"system\.ruby\.RequestType\.Locked_RMW_.*::total\s+(\d+)",
-
-        # --- 控制器瓶颈 (Controller Bottlenecks) ---
-        # L1 Cache 控制器最忙的周期数 (反映私有缓存压力)
-        "Max_L1_BusyCycles": r"system\.ruby\.controllers\d+\.fullyBusyCycles\s+(\d+)",
-        # L1 输入队列平均阻塞时间 (反映 CPU 请求由于缓存忙而排队的时间)
-        "L1_MandatoryQueue_Lat": r"system\.ruby\.controllers\d+\.mandatoryQueue\.m_avg_stall_time\s+([0-9\.e\-\+]+)",
-        
-        # --- 片上网络 (Interconnect / NoC) ---
-        # 控制消息 (Request/Response) 的平均延迟 (VNet 0, 1)
-        "NoC_Control_Lat": r"system\.ruby\.network\.average_flit_vnet_latency\s+\|\s*([0-9\.]+)\s*\|\s*([0-9\.]+)",
-        # 数据消息 (Data) 的平均延迟 (VNet 2) - 如果带宽不足，这个值会飙升
-        "NoC_Data_Lat": r"system\.ruby\.network\.average_flit_vnet_latency\s+.*\|\s*([0-9\.]+)\s*$",
-        # 网络总注入量
-        "NoC_Flits_Injected": r"system\.ruby\.network\.flits_injected::total\s+(\d+)",
-        # 平均每一跳消耗的周期
-        "NoC_Avg_Hops": r"system\.ruby\.network\.average_hops\s+([0-9\.e\-\+]+)",
-        
-        # --- 内存带宽 ---
-        "DRAM_Read_BW": r"system\.mem_ctrl\.dram\.bwRead::total\s+([0-9\.e\-\+]+)",
-        "DRAM_Write_BW": r"system\.mem_ctrl\.dram\.bwWrite::total\s+([0-9\.e\-\+]+)",
-    }
-
-def extract_max_from_matches(matches, convert_func=int):
-    """从多个匹配中提取最大值（例如找出最忙的那个核）"""
-    if not matches:
-        return 0
-    values = [convert_func(m) for m in matches]
-    return max(values)
-
-def extract_avg_from_matches(matches, convert_func=float):
-    """从多个匹配中提取平均值"""
-    if not matches:
-        return 0
-    values = [convert_func(m) for m in matches]
-    return sum(values) / len(values)
-
-def extract_middle_stats_block(content):
+STATS_BLOCK_MARKER = re.compile(rb'---------- (?:Begin|End) Simulation Statistics\s+----------')
+NON_SPACE = re.compile(rb'\S')
+
+def find_middle_stats_block(buf):
     """
-    提取中间的那个统计块（真正需要的simulation output段）
+    按字节偏移定位中间的那个统计块（真正需要的simulation output段）
+    返回 (start, end)，找不到时返回 None
     """
-    # 使用正则表达式分割统计块
-    blocks = re.split(r'---------- (?:Begin|End) Simulation Statistics\s+----------', content)
-    
-    # 过滤掉空字符串
-    blocks = [block.strip() for block in blocks if block.strip()]
-    
+    boundaries = [0]
+    for m in STATS_BLOCK_MARKER.finditer(buf):
+        boundaries.extend([m.start(), m.end()])
+    boundaries.append(len(buf))
+
+    # 过滤掉只有空白的块
+    blocks = []
+    for start, end in zip(boundaries[0::2], boundaries[1::2]):
+        if NON_SPACE.search(buf, start, end):
+            blocks.append((start, end))
+
     # 应该有三个块，我们取中间的那个
     if len(blocks) >= 3:
-        return blocks[1]  # 第二个块（索引为1）
+        return blocks[1]
     elif len(blocks) == 1:
         return blocks[0]  # 如果只有一个块，就用它
     else:
         print(f"Warning: Unexpected number of stats blocks: {len(blocks)}")
-        return blocks[0] if blocks else ""
+        return blocks[0] if blocks else None
+
+STREAM_CHUNK_SIZE = 1 << 20
+
+def extract_stream(f, plan, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    从二进制流中按块读取 (用于解压流)，边读边按提取计划累加，内存占用与文件大小无关
+    自行跟踪 Begin/End 标记，选块规则与 find_middle_stats_block 相同
+    """
+    # 只保留前两个非空块的数值，另外统计非空块的总数
+    kept = []
+    nonempty = 0
+    values = plan.new_values()
+    has_content = False
+
+    def close_block():
+        nonlocal nonempty, values, has_content
+        if has_content:
+            nonempty += 1
+            if len(kept) < 2:
+                kept.append(values)
+        values = plan.new_values()
+        has_content = False
+
+    tail = b''
+    while True:
+        chunk = f.read(chunk_size)
+        buf = tail + chunk
+        # 只处理完整的行，最后不完整的一行留到下一块
+        cut = len(buf) if not chunk else buf.rfind(b'\n') + 1
+        tail = buf[cut:]
+
+        pos = 0
+        for m in STATS_BLOCK_MARKER.finditer(buf, 0, cut):
+            has_content = has_content or bool(NON_SPACE.search(buf, pos, m.start()))
+            plan.scan(buf, pos, m.start(), values)
+            close_block()
+            pos = m.end()
+        has_content = has_content or bool(NON_SPACE.search(buf, pos, cut))
+        plan.scan(buf, pos, cut, values)
+
+        if not chunk:
+            break
+    close_block()
 
-def parse_file(filepath):
+    # 应该有三个块，我们取中间的那个
+    if nonempty >= 3:
+        return plan.evaluate(kept[1])
+    if nonempty != 1:
+        print(f"Warning: Unexpected number of stats blocks: {nonempty}")
+    return plan.evaluate(kept[0]) if kept else None
+
+def read_stats_metrics(filepath, plan, use_mmap=False):
+    """
+    读取统计文件并按提取计划得到指标
+    mmap 模式下只解码统计项名命中计划的行，内存占用与文件大小无关
+    压缩文件和归档成员不能 mmap，边解压边提取 (extract_stream)
+    """
+    if is_archived(filepath):
+        with open_stats(filepath) as f:
+            return extract_stream(f, plan)
+
+    with open(filepath, 'rb') as f:
+        if not use_mmap:
+            buf = f.read()
+            block = find_middle_stats_block(buf)
+            return plan.extract(buf, *block) if block else None
+
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            block = find_middle_stats_block(mm)
+            return plan.extract(mm, *block) if block else None
+
+def parse_file(filepath, use_mmap=False):
     data = {}
     
     # 首先从文件名中提取参数
@@ -121,87 +194,12 @@ def parse_file(filepath):
     data.update(filename_params)
     
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-            
-            # 提取中间统计块
-            stats_content = extract_middle_stats_block(content)
-            if not stats_content:
-                print(f"Warning: No valid stats block found in {filepath}")
-                return None
-            
-            # 1. 基础提取
-            patterns = get_advanced_patterns()
-            
-            # 针对 IPC 计算平均值
-            ipc_matches = re.findall(patterns["AvgIPC"], stats_content)
-            data["AvgIPC"] = extract_avg_from_matches(ipc_matches)
-
-            cpu_cycles = re.findall(patterns["cycles"], stats_content)
-            data["LoadBalance"] = extract_max_from_matches(cpu_cycles)/extract_avg_from_matches(cpu_cycles)
-
-            # 针对 Coherence Events (直接取 Total)
-            for key in ["Coh_FwdGetM (Write Contention)", "Coh_FwdGetS (Read Sharing)", 
-                        "Coh_Invalidations", "Coh_Writebacks (PutAck)"]:
-                match = re.search(patterns[key], stats_content)
-                data[key] = int(match.group(1)) if match else 0
-
-            # 针对 Locked RMW (可能有 Read 和 Write 两种，求和)
-            rmw_matches = re.findall(patterns["Coh_Locked_RMW"], stats_content)
-            data["Coh_Locked_RMW"] = sum([int(x) for x in rmw_matches])
-
-            # 针对 Controller Busy (找出最忙的那个控制器，代表系统瓶颈)
-            busy_matches = re.findall(r"system\.ruby\.controllers(\d+)\.fullyBusyCycles\s+(\d+)", stats_content)
-            # 我们只关心 L1 控制器 (通常 ID 较小) 或 Directory (ID 较大)，这里取所有控制器的最大值作为系统"最堵"的程度
-            if busy_matches:
-                # busy_matches is [(id, cycles), (id, cycles)...]
-                data["Max_Controller_BusyCycles"] = max([int(m[1]) for m in busy_matches])
-            else:
-                data["Max_Controller_BusyCycles"] = 0
-
-            # 针对 Mandatory Queue Latency (取最大值，看哪个核被阻塞最久)
-            q_matches = re.findall(r"system\.ruby\.controllers\d+\.mandatoryQueue\.m_avg_stall_time\s+([0-9\.e\-\+]+)", stats_content)
-            data["Max_MandatoryQueue_Stall"] = extract_max_from_matches(q_matches, float)
-
-            # 针对 NoC VNet Latency (Gem5 输出通常是 | val | val | val |)
-            # 假设 VNet 0/1 是控制，VNet 2 是数据
-            vnet_match = re.search(r"system\.ruby\.network\.average_flit_vnet_latency\s+\|([0-9\.\s]+)\|", stats_content)
-            if vnet_match:
-                parts = vnet_match.group(1).strip().split('|')
-                # 清理空格
-                vals = [float(x.strip()) for x in parts if x.strip()]
-                if len(vals) >= 3:
-                    data["NoC_Control_Lat"] = (vals[0] + vals[1]) / 2
-                    data["NoC_Data_Lat"] = vals[2]
-                elif len(vals) >= 1:
-                    data["NoC_Control_Lat"] = vals[0]
-                    data["NoC_Data_Lat"] = 0
-            else:
-                data["NoC_Control_Lat"] = 0
-                data["NoC_Data_Lat"] = 0
-
-            # 其他单值提取
-            for key in ["SimSeconds", "NoC_Flits_Injected", "NoC_Avg_Hops", "DRAM_Read_BW"]:
-                match = re.search(patterns[key], stats_content)
-                data[key] = float(match.group(1)) if match else 0
-
-            # --- 计算衍生指标 (Insight) ---
-            
-            # 1. 一致性与计算比 (Coherence per Instruction)
-            # 如果这个值高，说明每执行少量指令就会触发昂贵的一致性操作
-            total_insts = float(re.search(patterns["Total_Insts"], stats_content).group(1)) if re.search(patterns["Total_Insts"], stats_content) else 1
-            data["Total_Insts"] = total_insts
-            
-            coherence_events = data["Coh_FwdGetM (Write Contention)"] + data["Coh_Invalidations"]
-            data["Contention_Intensity"] = (coherence_events / total_insts) * 1000 # 每1000条指令的竞争次数
-
-            # 2. 伪共享/真竞争 严重程度
-            # 如果 FwdGetM 很高，说明多个核在争抢写权限
-            data["Write_Contention_Count"] = data["Coh_FwdGetM (Write Contention)"]
-
-            # 3. 阻塞程度
-            # Mandatory Queue Stall Time 高说明 CPU 等待 L1 响应的时间长
-            data["CPU_Stall_Severity"] = data["Max_MandatoryQueue_Stall"]
+        # 提取中间统计块并按指标目录一次性提取全部指标
+        stats = read_stats_metrics(filepath, get_metric_plan(), use_mmap)
+        if not stats:
+            print(f"Warning: No valid stats block found in {filepath}")
+            return None
+        data.update(stats)
 
     except Exception as e:
         print(f"Error processing {filepath}: {e}")
@@ -209,7 +207,100 @@ def parse_file(filepath):
     
     return data
 
+# 95% 双侧 t 分布临界值，下标为自由度 (1..30)，更大的自由度用正态近似
+T_CRITICAL_95 = [
+    None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+def t_critical(df):
+    return T_CRITICAL_95[df] if df < len(T_CRITICAL_95) else 1.960
+
+def summarize(values):
+    """
+    重复运行的统计量: (均值, 样本标准差, 95% 置信区间半宽)
+    只有一次运行时标准差和置信区间为 None
+    """
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, None, None
+    std = (sum((v - mean) ** 2 for v in values) / (n - 1)) ** 0.5
+    return mean, std, t_critical(n - 1) * std / n ** 0.5
+
+def relative_ci(values):
+    """置信区间半宽 / |均值|，用来判断重复次数是否足够"""
+    mean, _, half_width = summarize(values)
+    if half_width is None:
+        return None
+    if mean == 0:
+        return 0.0 if half_width == 0 else float("inf")
+    return half_width / abs(mean)
+
+def aggregate_repetitions(results):
+    """
+    把同一配置 (除 Repetition 外的字段都相同) 的多次运行合并
+    每个数值指标输出 <指标>_Mean / _Std / _CI95 (95% 置信区间半宽)
+    第 0 次运行没有扰动，同一配置有扰动运行 (Repetition > 0) 时不计入统计
+    """
+    config_cols = [name for name, _, _ in CONFIG_FIELDS if name != "Repetition"]
+    groups = {}
+    for row in results:
+        groups.setdefault(tuple(row.get(c) for c in config_cols), []).append(row)
+
+    summary = []
+    for key, rows in groups.items():
+        perturbed = [row for row in rows if int(row.get("Repetition") or 0) > 0]
+        rows = perturbed or rows
+        record = dict(zip(config_cols, key))
+        record["Repetitions"] = len(rows)
+        for metric in rows[0]:
+            if metric in config_cols or metric in ("Filename", "Repetition"):
+                continue
+            values = [row.get(metric) for row in rows]
+            if not all(isinstance(v, (int, float)) for v in values):
+                continue
+            mean, std, half_width = summarize(values)
+            record[metric + "_Mean"] = mean
+            record[metric + "_Std"] = std
+            record[metric + "_CI95"] = half_width
+        summary.append(record)
+    return summary
+
+def find_stats_files(input_dir):
+    """
+    目录下所有统计文件: 普通/压缩的 stats-*.txt 以及 *.tar 归档中的成员
+    同一配置出现多次时 (例如归档后又重新运行) 只取第一个
+    """
+    candidates = []
+    for filename in sorted(os.listdir(input_dir)):
+        filepath = os.path.join(input_dir, filename)
+        if is_stats_name(filename):
+            candidates.append(filepath)
+        elif filename.endswith(".tar"):
+            candidates.extend(p for p in list_bundle(filepath) if is_stats_name(member_name(p)))
+
+    seen = set()
+    paths = []
+    for filepath in candidates:
+        key = strip_compression(member_name(filepath))
+        if key in seen:
+            print(f"Warning: duplicate stats for {key}, skipping {filepath}")
+            continue
+        seen.add(key)
+        paths.append(filepath)
+    return paths
+
 def main():
+    parser = argparse.ArgumentParser()
+    # mmap 模式: 按字节偏移定位统计块，只解码需要的统计行，适合大文件
+    parser.add_argument("--mmap", action="store_true")
+    # 能耗模型: 追加能耗/EDP/每瓦性能列，可用 JSON 覆盖默认系数 (见 energy.py)
+    parser.add_argument("--energy", action="store_true")
+    parser.add_argument("--energy-coefficients", type=str, default=None)
+    args = parser.parse_args()
+
     # --- 修改点 1: 定义输入目录 ---
     # 假设 GENERATED_DIR 和 RESULTS_DIR 来自 from env import *
     if 'GENERATED_DIR' not in globals() or 'RESULTS_DIR' not in globals():
@@ -235,22 +326,24 @@ def main():
 
     # --- 修改点 3: 遍历逻辑不再依赖 args.input_dir，改用 input_dir ---
     print(f"Scanning directory: {input_dir}")
-    for filename in os.listdir(input_dir):
-        if filename.startswith("stats-") and filename.endswith(".txt"):
-            filepath = os.path.join(input_dir, filename)
-            print(f"Analyzing: {filepath}")
-            row = parse_file(filepath)
-            if row:
-                row["Filename"] = filename  # 保留原始文件名用于参考
-                results.append(row)
+    for filepath in find_stats_files(input_dir):
+        print(f"Analyzing: {filepath}")
+        row = parse_file(filepath, use_mmap=args.mmap)
+        if row:
+            row["Filename"] = member_name(filepath)  # 保留原始文件名用于参考
+            results.append(row)
 
     if not results:
         print("No valid data found to process.")
         return
 
+    if args.energy:
+        coefficients = load_coefficients(args.energy_coefficients)
+        for row in results:
+            row.update(estimate_energy(row, coefficients))
+
     # 确定列顺序 - 将文件名参数放在前面
-    filename_cols = ["Filename", "Application", "CPU_Num", "Cacheline_Size_Bytes", "Cachesize_kB",
-                     "Network_Topology", "Network_Flit_Size", "Network_Hop_Latency"]
+    filename_cols = ["Filename"] + [name for name, _, _ in CONFIG_FIELDS]
     
     fixed_stats_cols = ["SimSeconds", "Total_Insts", "AvgIPC", "LoadBalance", "Contention_Intensity", 
                       "Write_Contention_Count", "Coh_Locked_RMW", "CPU_Stall_Severity",
@@ -276,5 +369,18 @@ def main():
     except IOError as e:
         print(f"Error writing to file {output_file}: {e}")
 
+    # 有重复运行时额外输出均值/标准差/置信区间汇总
+    if any(row.get("Repetition", 0) > 0 for row in results):
+        summary = aggregate_repetitions(results)
+        summary_file = output_file.replace('.csv', '-summary.csv')
+        summary_cols = list(dict.fromkeys(c for row in summary for c in row))
+        with open(summary_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=summary_cols)
+            writer.writeheader()
+            for row in summary:
+                writer.writerow(row)
+        print(f"Repetition summary: {summary_file}")
+        print("CHECK: compare configs by '<metric>_Mean' only when their '_CI95' ranges do not overlap.")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
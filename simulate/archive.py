@@ -0,0 +1,213 @@
+import os
+import io
+import gzip
+import json
+import shutil
+import tarfile
+import contextlib
+
+# zstd 是可选依赖，只有使用 .zst 时才需要
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 统计文件的压缩归档
+# 单个文件: stats-<config>.txt.gz / stats-<config>.txt.zst
+# 按扫描打包: <bundle>.tar，成员仍逐个压缩，另有 <bundle>.tar.index.json 记录每个成员的数据偏移，
+#            读取单个成员时直接定位，不需要遍历整个 tar
+# 归档成员路径写作 <bundle>.tar::<member>
+
+COMPRESSIONS = {"gz": ".gz", "zst": ".zst"}
+BUNDLE_SEPARATOR = "::"
+
+def require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+def check_compression(compression):
+    """在运行模拟之前检查压缩方式是否可用，不可用时抛出异常"""
+    if compression is None:
+        return
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"invalid compression: {compression}")
+    if compression == "zst":
+        require_zstandard()
+
+def compressed_name(name, compression=None):
+    """在文件名后加上压缩后缀，compression 为 None 时不变"""
+    if compression is None:
+        return name
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"invalid compression: {compression}")
+    return name + COMPRESSIONS[compression]
+
+def member_name(path):
+    """路径中真正的文件名部分 (归档成员路径取成员名)"""
+    return os.path.basename(path.split(BUNDLE_SEPARATOR)[-1])
+
+def strip_compression(name):
+    """去掉压缩后缀: stats-x.txt.gz -> stats-x.txt"""
+    for suffix in COMPRESSIONS.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def is_stats_name(name):
+    return name.startswith("stats-") and strip_compression(name).endswith(".txt")
+
+def compress_file(source_path, destination_path, compression):
+    """
+    流式压缩，不把整个文件读进内存
+    压缩器准备好之后才创建目标文件，失败时删除写了一半的目标文件
+    """
+    check_compression(compression)
+    zstd_compressor = require_zstandard().ZstdCompressor() if compression == "zst" else None
+    try:
+        with open(source_path, 'rb') as src, open(destination_path, 'wb') as dst:
+            if zstd_compressor is not None:
+                zstd_compressor.copy_stream(src, dst)
+            else:
+                with gzip.GzipFile(fileobj=dst, mode='wb') as out:
+                    shutil.copyfileobj(src, out)
+    except BaseException:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+        raise
+
+def bundle_index_path(bundle_path):
+    return bundle_path + ".index.json"
+
+def index_bundle(bundle_path):
+    """扫描 tar 头，重建 {成员名: [数据偏移, 大小]} 索引"""
+    with tarfile.open(bundle_path, 'r:') as tar:
+        index = {m.name: [m.offset_data, m.size] for m in tar.getmembers() if m.isfile()}
+    with open(bundle_index_path(bundle_path), 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+def load_bundle_index(bundle_path):
+    """读取成员索引，索引缺失或比 tar 旧时重建"""
+    index_path = bundle_index_path(bundle_path)
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(bundle_path):
+        with open(index_path) as f:
+            return json.load(f)
+    return index_bundle(bundle_path)
+
+def padded_size(size):
+    """tar 成员数据按 512 字节块对齐后的大小"""
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+def add_to_bundle(bundle_path, source_path, name):
+    """
+    把文件追加到 (未压缩的) tar 中并更新索引，同名成员以最后一次为准
+    由索引算出最后一个成员的结尾，直接从那里写入新成员并覆盖结束块，
+    索引只增加新成员一项，不重新扫描已有的 tar 头 (tarfile 的 'a' 模式会扫描全部成员)
+    """
+    if os.path.exists(bundle_path):
+        index = load_bundle_index(bundle_path)
+        end = max((offset + padded_size(size) for offset, size in index.values()), default=0)
+    else:
+        index = {}
+        end = 0
+
+    with open(bundle_path, 'r+b' if end else 'wb') as f:
+        f.seek(end)
+        with tarfile.open(fileobj=f, mode='w:') as tar:
+            tar.add(source_path, arcname=name)
+            # 成员头的长度不固定 (长文件名时有扩展头)，从写入后的位置倒推数据偏移
+            size = os.path.getsize(source_path)
+            index[name] = [tar.offset - padded_size(size), size]
+        # 新的结束块可能比原来的短，去掉后面残留的旧数据
+        f.truncate()
+
+    with open(bundle_index_path(bundle_path), 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+def store_stats(source_path, destination_dir, name, compression=None, bundle=None):
+    """
+    把 gem5 输出的统计文件移入 destination_dir
+    可选压缩，并可追加到 destination_dir/<bundle>.tar 中
+    返回最终的路径
+    """
+    check_compression(compression)
+    name = compressed_name(name, compression)
+    os.makedirs(destination_dir, exist_ok=True)
+
+    if bundle is None:
+        destination_path = os.path.join(destination_dir, name)
+        if compression is None:
+            shutil.move(source_path, destination_path)
+        else:
+            compress_file(source_path, destination_path, compression)
+            os.remove(source_path)
+        return destination_path
+
+    bundle_path = os.path.join(destination_dir, bundle + ".tar")
+    if compression is None:
+        add_to_bundle(bundle_path, source_path, name)
+    else:
+        staged_path = source_path + COMPRESSIONS[compression]
+        compress_file(source_path, staged_path, compression)
+        try:
+            add_to_bundle(bundle_path, staged_path, name)
+        finally:
+            os.remove(staged_path)
+    os.remove(source_path)
+    return bundle_path + BUNDLE_SEPARATOR + name
+
+def list_bundle(bundle_path):
+    """归档中所有成员的路径 (<bundle>.tar::<member>)"""
+    return [bundle_path + BUNDLE_SEPARATOR + name for name in sorted(load_bundle_index(bundle_path))]
+
+class MemberReader(io.RawIOBase):
+    """tar 中一个成员的只读视图，按索引中的偏移直接读取"""
+
+    def __init__(self, f, offset, size):
+        self.f = f
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self.pos)
+        if n <= 0:
+            return 0
+        self.f.seek(self.offset + self.pos)
+        data = self.f.read(n)
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+def is_archived(path):
+    """是否需要解压或从归档中读取 (这类文件不能直接 mmap)"""
+    return BUNDLE_SEPARATOR in path or strip_compression(path) != path
+
+@contextlib.contextmanager
+def open_stats(path):
+    """
+    以二进制流打开统计文件，按后缀透明解压
+    支持普通文件、.gz、.zst 以及 <bundle>.tar::<member>，全程不写临时文件
+    """
+    with contextlib.ExitStack() as stack:
+        if BUNDLE_SEPARATOR in path:
+            bundle_path, name = path.split(BUNDLE_SEPARATOR, 1)
+            index = load_bundle_index(bundle_path)
+            if name not in index:
+                raise FileNotFoundError(f"{name} not in {bundle_path}")
+            offset, size = index[name]
+            raw = stack.enter_context(open(bundle_path, 'rb'))
+            f = stack.enter_context(io.BufferedReader(MemberReader(raw, offset, size)))
+        else:
+            name = path
+            f = stack.enter_context(open(path, 'rb'))
+
+        if name.endswith(COMPRESSIONS["gz"]):
+            f = stack.enter_context(gzip.GzipFile(fileobj=f, mode='rb'))
+        elif name.endswith(COMPRESSIONS["zst"]):
+            f = stack.enter_context(require_zstandard().ZstdDecompressor().stream_reader(f))
+        yield f
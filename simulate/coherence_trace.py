@@ -0,0 +1,234 @@
+import os
+import re
+import csv
+import gzip
+import json
+import argparse
+from env import *
+
+# Ruby ProtocolTrace 行格式:
+#   <tick> <version> <component> <event> <state>><next_state> [<addr>, line <line_addr>] <comment>
+# Sequencer 的 Begin 行带有请求的字节地址和请求类型 (LD/ST/...)，
+# 控制器的状态转换行带有状态变化，用于统计所有权转移
+TRACE_LINE = re.compile(
+    r"^\s*(\d+)\s+(\d+)\s+(\S+)\s+(\S+)\s+(\S*)>(\S*)\s+"
+    r"\[?(0x[0-9a-fA-F]+)(?:,\s*line\s+(0x[0-9a-fA-F]+))?\]?\s*(\S*)"
+)
+
+READ_TYPES = {"LD", "RMW_Read", "Locked_RMW_Read", "Load_Linked"}
+WRITE_TYPES = {"ST", "RMW_Write", "Locked_RMW_Write", "Store_Conditional", "ATOMIC",
+               "ATOMIC_RETURN", "ATOMIC_NO_RETURN"}
+
+# Sequencer 的 Begin 行只有起始地址、没有访问大小，因此按字 (默认 8 字节) 记录访问位置:
+# 一次访问只标记起始地址所在的字，跨字的访问只记第一个字；
+# 同一字内不同字节的访问会被判为 true_sharing (保守: 可能漏报字内的伪共享，不会把
+# 8 字节写和它覆盖的 4 字节读误报为 false_sharing)
+DEFAULT_WORD_BYTES = 8
+
+# 每条缓存行在表中的状态
+def new_line_record():
+    return {
+        "reads": {},        # core -> 读过的字 bitmask
+        "writes": {},       # core -> 写过的字 bitmask
+        "owner": None,      # 当前持有 M 状态的核
+        "transfers": 0,     # 所有权在核之间转移的次数
+        "fwd_getm": 0,      # FwdGetM 事件次数
+    }
+
+def open_trace(path):
+    """按文本流打开 trace，.gz 文件边读边解压"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="replace")
+    return open(path, "r", errors="replace")
+
+def load_trace_settings(trace_path):
+    """读取 main.py 在 trace 旁边写下的地址窗口和采样率"""
+    settings_path = re.sub(r"\.out(\.gz)?$", "", trace_path) + ".json"
+    if not os.path.exists(settings_path):
+        return {}
+    with open(settings_path, "r") as f:
+        return json.load(f)
+
+def line_sampled(line_addr, line_bytes, sample_rate):
+    """按缓存行地址哈希采样，同一行的所有事件要么全部保留要么全部丢弃"""
+    if sample_rate >= 1.0:
+        return True
+    h = ((line_addr // line_bytes) * 2654435761) & 0xffffffff
+    return h < sample_rate * 0x100000000
+
+def reduce_trace(
+    trace_path,
+    line_bytes=64,
+    addr_start=0,
+    addr_end=None,
+    sample_rate=1.0,
+    max_lines=100000,
+    word_bytes=DEFAULT_WORD_BYTES,
+):
+    """
+    流式处理 trace，归约为每条缓存行的访问表 (访问位置按 word_bytes 字节的字记录)
+    只保存窗口内、被采样且不超过 max_lines 条的缓存行，内存占用与 trace 大小无关
+    """
+    lines = {}
+    dropped = set()
+    dropped_count = 0
+    events = 0
+
+    with open_trace(trace_path) as f:
+        for raw in f:
+            m = TRACE_LINE.match(raw)
+            if not m:
+                continue
+            _, version, component, event, state, next_state, addr, line, comment = m.groups()
+
+            addr = int(addr, 16)
+            line_addr = int(line, 16) if line else addr & ~(line_bytes - 1)
+            if line_addr < addr_start or (addr_end is not None and line_addr >= addr_end):
+                continue
+            if not line_sampled(line_addr, line_bytes, sample_rate):
+                continue
+
+            record = lines.get(line_addr)
+            if record is None:
+                if len(lines) >= max_lines:
+                    # 表已满: 新的缓存行只计数不记录
+                    if len(dropped) < max_lines:
+                        dropped.add(line_addr)
+                    dropped_count += 1
+                    continue
+                record = lines[line_addr] = new_line_record()
+            events += 1
+
+            core = int(version)
+            if component == "Seq":
+                if event != "Begin":
+                    continue
+                offset_bit = 1 << ((addr - line_addr) // word_bytes)
+                if comment in WRITE_TYPES:
+                    record["writes"][core] = record["writes"].get(core, 0) | offset_bit
+                elif comment in READ_TYPES:
+                    record["reads"][core] = record["reads"].get(core, 0) | offset_bit
+            elif component == "L1Cache":
+                if event == "FwdGetM":
+                    record["fwd_getm"] += 1
+                if next_state == "M" and state != "M":
+                    if record["owner"] is not None and record["owner"] != core:
+                        record["transfers"] += 1
+                    record["owner"] = core
+
+    return lines, {"events": events, "dropped_events": dropped_count, "dropped_lines": len(dropped)}
+
+def offsets_of(mask):
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+def classify_line(record):
+    """
+    private: 只有一个核访问
+    false_sharing: 多个核访问、至少一个核写，且各核访问的字互不相交
+    true_sharing: 多个核访问同一个字 (字内不同字节也算，见 DEFAULT_WORD_BYTES)
+    """
+    cores = set(record["reads"]) | set(record["writes"])
+    if len(cores) < 2:
+        return "private"
+    if not record["writes"]:
+        return "read_shared"
+
+    seen = 0
+    for core in cores:
+        mask = record["reads"].get(core, 0) | record["writes"].get(core, 0)
+        if seen & mask:
+            return "true_sharing"
+        seen |= mask
+    return "false_sharing"
+
+def build_rows(lines, include_private=False, word_bytes=DEFAULT_WORD_BYTES):
+    rows = []
+    for line_addr, record in lines.items():
+        kind = classify_line(record)
+        if kind == "private" and not include_private:
+            continue
+        cores = sorted(set(record["reads"]) | set(record["writes"]))
+        rows.append({
+            "Line_Addr": hex(line_addr),
+            "Classification": kind,
+            "Cores": len(cores),
+            "Writers": len(record["writes"]),
+            "Ownership_Transfers": record["transfers"],
+            "FwdGetM": record["fwd_getm"],
+            # 每个核访问过的字的起始字节偏移
+            "Word_Bytes": word_bytes,
+            "Core_Offsets": "; ".join(
+                f"{core}:" + ",".join(
+                    str(o * word_bytes) for o in offsets_of(record["reads"].get(core, 0) | record["writes"].get(core, 0))
+                )
+                for core in cores
+            ),
+        })
+    rows.sort(key=lambda r: (r["Ownership_Transfers"], r["FwdGetM"]), reverse=True)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect false sharing from a Ruby ProtocolTrace")
+    parser.add_argument("trace", type=str, help="trace-*.out.gz written by main.py --trace-coherence")
+    parser.add_argument("--line-bytes", type=int, default=None)
+    parser.add_argument("--addr-start", type=lambda x: int(x, 0), default=None)
+    parser.add_argument("--addr-end", type=lambda x: int(x, 0), default=None)
+    parser.add_argument("--sample-rate", type=float, default=None)
+    parser.add_argument("--max-lines", type=int, default=100000)
+    parser.add_argument("--word-bytes", type=int, default=DEFAULT_WORD_BYTES,
+                        help="granularity of the recorded access offsets (accesses carry no size)")
+    parser.add_argument("--all", action="store_true", help="also report private lines")
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    # 命令行参数优先，其次是 main.py 记录的设置
+    settings = load_trace_settings(args.trace)
+    line_bytes = args.line_bytes or settings.get("cache_line_bytes", 64)
+    addr_start = args.addr_start if args.addr_start is not None else settings.get("addr_start", 0)
+    addr_end = args.addr_end if args.addr_end is not None else settings.get("addr_end")
+    sample_rate = args.sample_rate if args.sample_rate is not None else settings.get("sample_rate", 1.0)
+
+    print(f"Reducing trace: {args.trace}")
+    lines, summary = reduce_trace(
+        args.trace,
+        line_bytes=line_bytes,
+        addr_start=addr_start,
+        addr_end=addr_end,
+        sample_rate=sample_rate,
+        max_lines=args.max_lines,
+        word_bytes=args.word_bytes,
+    )
+    rows = build_rows(lines, include_private=args.all, word_bytes=args.word_bytes)
+
+    output_file = args.output or os.path.join(
+        RESULTS_DIR, "false_sharing-" + re.sub(r"\.out(\.gz)?$", "", os.path.basename(args.trace)) + ".csv"
+    )
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    fieldnames = ["Line_Addr", "Classification", "Cores", "Writers",
+                  "Ownership_Transfers", "FwdGetM", "Word_Bytes", "Core_Offsets"]
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+    counts = {}
+    for row in rows:
+        counts[row["Classification"]] = counts.get(row["Classification"], 0) + 1
+
+    print(f"Events: {summary['events']}, tracked lines: {len(lines)}")
+    if summary["dropped_events"]:
+        print(f"Warning: line table full, dropped {summary['dropped_events']} events "
+              f"on >= {summary['dropped_lines']} lines (raise --max-lines or lower --sample-rate)")
+    for kind, count in sorted(counts.items()):
+        print(f"  {kind}: {count} lines")
+
+    print("\nTop false-sharing lines:")
+    for row in [r for r in rows if r["Classification"] == "false_sharing"][:10]:
+        print(f"  {row['Line_Addr']}  transfers={row['Ownership_Transfers']}  "
+              f"FwdGetM={row['FwdGetM']}  offsets={row['Core_Offsets']}")
+
+    print(f"\nReport successfully generated: {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import csv
+import math
+import argparse
+import sys
+from env import *
+from analysis import parse_filename, format_config_name
+
+# 回归比较关注的指标及其"更好"的方向
+# lower: 数值越小越好 (例如运行时间、延迟)
+# higher: 数值越大越好 (例如 IPC)
+COMPARE_METRICS = {
+    "SimSeconds": "lower",
+    "AvgIPC": "higher",
+    "LoadBalance": "lower",
+    "Contention_Intensity": "lower",
+    "Write_Contention_Count": "lower",
+    "CPU_Stall_Severity": "lower",
+    "NoC_Control_Lat": "lower",
+    "NoC_Data_Lat": "lower",
+    "NoC_Avg_Hops": "lower",
+}
+
+def config_key(filename):
+    """
+    从结果行的文件名得到配置键
+    例如: stats-Matrix_symm-1-64-16-mesh-16-1.txt -> stats-Matrix_symm-1-64-16-mesh-16-1-4-4-1-o3-0
+    旧格式文件名缺少的字段补为默认值，因此新旧结果可以互相比较
+    """
+    params = parse_filename(filename)
+    if params:
+        return "stats-" + format_config_name(params)
+    return os.path.basename(filename).replace('.txt', '')
+
+def load_results(csv_path):
+    """
+    读取 analysis.py 生成的 results-*.csv，按配置键建立索引
+    """
+    rows = {}
+    with open(csv_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            if not row.get("Filename"):
+                continue
+            rows[config_key(row["Filename"])] = row
+    return rows
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def relative_delta(base, new):
+    """相对变化 (new - base) / base；基线为 0 时只在两者都为 0 时返回 0"""
+    if base == 0:
+        return 0.0 if new == 0 else math.inf
+    return (new - base) / abs(base)
+
+def geometric_mean(values):
+    """正数序列的几何平均，忽略非正值"""
+    values = [v for v in values if v > 0 and math.isfinite(v)]
+    if not values:
+        return None
+    return math.exp(sum(math.log(v) for v in values) / len(values))
+
+def rank_values(values):
+    """平均秩 (并列取平均)，最小值的秩为 1"""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+def spearman(xs, ys):
+    """Spearman 秩相关系数，样本少于 3 个或方差为 0 时返回 None"""
+    if len(xs) != len(ys) or len(xs) < 3:
+        return None
+    rx, ry = rank_values(xs), rank_values(ys)
+    mx, my = sum(rx) / len(rx), sum(ry) / len(ry)
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) ** 2 for a in rx)
+    vy = sum((b - my) ** 2 for b in ry)
+    if vx == 0 or vy == 0:
+        return None
+    return cov / math.sqrt(vx * vy)
+
+def classify(delta, direction, tolerance, threshold):
+    """
+    根据相对变化判断结果:
+    same: 在容差带内; better/worse: 超出容差带; regression: 变差且超出阈值
+    """
+    if abs(delta) <= tolerance:
+        return "same"
+    worse = delta > 0 if direction == "lower" else delta < 0
+    if not worse:
+        return "better"
+    return "regression" if abs(delta) > threshold else "worse"
+
+def compare_results(baseline, candidate, metrics, tolerance, threshold):
+    """
+    按配置键连接两组结果，返回逐项比较记录和每个应用的几何平均比值
+    """
+    records = []
+    ratios = {}
+
+    for key in sorted(set(baseline) & set(candidate)):
+        base_row = baseline[key]
+        new_row = candidate[key]
+        app = base_row.get("Application", "")
+
+        for metric, direction in metrics.items():
+            base = to_float(base_row.get(metric))
+            new = to_float(new_row.get(metric))
+            if base is None or new is None:
+                continue
+
+            delta = relative_delta(base, new)
+            records.append({
+                "Config": key,
+                "Application": app,
+                "Metric": metric,
+                "Baseline": base,
+                "Candidate": new,
+                "Delta": delta,
+                "Status": classify(delta, direction, tolerance, threshold),
+            })
+            if base > 0 and new > 0:
+                ratios.setdefault((app, metric), []).append(new / base)
+
+    summary = []
+    for (app, metric), values in sorted(ratios.items()):
+        gmean = geometric_mean(values)
+        delta = gmean - 1
+        summary.append({
+            "Application": app,
+            "Metric": metric,
+            "Configs": len(values),
+            "GeoMean_Ratio": gmean,
+            "Status": classify(delta, metrics[metric], tolerance, threshold),
+        })
+
+    return records, summary
+
+def format_delta(delta):
+    if math.isinf(delta):
+        return "inf"
+    return f"{delta * 100:+.2f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two sweep result sets")
+    parser.add_argument("baseline", type=str, help="baseline results csv")
+    parser.add_argument("candidate", type=str, help="candidate results csv")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="relative change treated as noise")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="relative slowdown treated as a regression")
+    parser.add_argument("--gate", type=str, nargs="+", default=["SimSeconds"],
+                        help="metrics whose regressions fail the comparison")
+    parser.add_argument("--output", type=str, default=None,
+                        help="optional csv for the per-config deltas")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="do not fail when baseline configs are missing from the candidate")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print every compared value, not only changes")
+    args = parser.parse_args()
+
+    for metric in args.gate:
+        if metric not in COMPARE_METRICS:
+            print(f"Error: unknown gate metric '{metric}'")
+            return 2
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    common = set(baseline) & set(candidate)
+    print(f"Baseline: {len(baseline)} configs, Candidate: {len(candidate)} configs, Common: {len(common)}")
+    if not common:
+        print("No common configurations to compare.")
+        return 2
+
+    # 基线中有而候选中没有的配置: 通常是候选版本运行失败，没有产生统计文件
+    missing = sorted(set(baseline) - set(candidate))
+    if missing:
+        print(f"\n--- Missing from candidate ({len(missing)}) ---")
+        for key in missing:
+            print(f"   missing  {key}")
+    extra = sorted(set(candidate) - set(baseline))
+    if extra and args.verbose:
+        print(f"\n--- Only in candidate ({len(extra)}) ---")
+        for key in extra:
+            print(f"     extra  {key}")
+
+    records, summary = compare_results(
+        baseline, candidate, COMPARE_METRICS, args.tolerance, args.threshold
+    )
+
+    # 逐配置变化
+    print("\n--- Per-config deltas ---")
+    for r in records:
+        if r["Status"] == "same" and not args.verbose:
+            continue
+        print(f"{r['Status']:>10}  {r['Config']:<45} {r['Metric']:<24} "
+              f"{r['Baseline']:.6g} -> {r['Candidate']:.6g} ({format_delta(r['Delta'])})")
+
+    # 每个应用的几何平均
+    print("\n--- Geometric mean per application (candidate / baseline) ---")
+    for s in summary:
+        print(f"{s['Status']:>10}  {s['Application']:<16} {s['Metric']:<24} "
+              f"{s['GeoMean_Ratio']:.4f} over {s['Configs']} configs")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0].keys()) if records else ["Config"])
+            writer.writeheader()
+            for r in records:
+                writer.writerow(r)
+        print(f"\nDeltas written to: {args.output}")
+
+    # 只有门控指标的回归会导致非零退出
+    regressions = [r for r in records if r["Metric"] in args.gate and r["Status"] == "regression"]
+    regressions += [s for s in summary if s["Metric"] in args.gate and s["Status"] == "regression"]
+    failed = False
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} regression(s) beyond {args.threshold * 100:.1f}% on {', '.join(args.gate)}")
+        failed = True
+    if missing and not args.allow_missing:
+        print(f"\nFAIL: {len(missing)} baseline config(s) missing from the candidate (use --allow-missing to ignore)")
+        failed = True
+    if failed:
+        return 1
+
+    print("\nPASS: no regressions on gated metrics")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import os
+import csv
+import json
+import argparse
+import datetime
+from functools import lru_cache
+from env import *
+from topology_analysis import analyze_topology
+
+# 非核心部分 (片上网络 + L1 + DRAM) 的能耗模型
+# 事件次数来自 stats.txt，路由器/链路数量来自 networks/ 下的网络构建器
+# 不包含 CPU 核本身的能耗，用于比较拓扑和缓存配置之间的能效差异
+#
+# 默认系数只是量级参考 (约 45nm 工艺)，做正式比较时应该用 --coefficients 指定
+# 与实际工艺匹配的 JSON 表，表中的项覆盖下面的同名默认值
+DEFAULT_COEFFICIENTS = {
+    # 片上网络动态能耗: 每个 flit 字节经过一个路由器 / 一条链路
+    "router_pJ_per_byte": 0.6,
+    "link_pJ_per_byte": 0.25,
+    # 片上网络静态功耗: 每个路由器端口 / 每条链路的每字节宽度
+    "router_static_mW_per_port": 0.5,
+    "link_static_mW_per_byte": 0.01,
+    # L1: 16kB 时每次访问的能耗，随容量按 (size / 16kB) ** exponent 变化
+    "l1_access_pJ_16kB": 20.0,
+    "l1_access_size_exponent": 0.5,
+    "l1_static_mW_per_kB": 0.5,
+    # DRAM: 每个突发传输 (64B) 的能耗和背景功耗
+    "dram_read_burst_pJ": 20000.0,
+    "dram_write_burst_pJ": 22000.0,
+    "dram_static_mW": 100.0,
+}
+
+# 能耗模型需要的配置列和统计列 (analysis.py 的结果行)
+REQUIRED_COLUMNS = [
+    "Network_Topology", "CPU_Num", "Network_Hop_Latency", "Network_Flit_Size", "Cachesize_kB",
+    "SimSeconds", "Total_Insts", "NoC_Flits_Injected",
+]
+# 旧版 analysis.py 生成的结果里没有这些列，缺失时不计对应的动态能耗，
+# 并在 L1_Dynamic_Missing / DRAM_Dynamic_Missing 中标出
+L1_ACCESS_COLUMN = "L1_Demand_Accesses"
+DRAM_BURST_COLUMNS = ["DRAM_Read_Bursts", "DRAM_Write_Bursts"]
+
+def load_coefficients(path=None):
+    """默认系数，path 指定的 JSON 中的项覆盖同名默认值"""
+    coefficients = dict(DEFAULT_COEFFICIENTS)
+    if path is None:
+        return coefficients
+    with open(path) as f:
+        overrides = json.load(f)
+    unknown = set(overrides) - set(DEFAULT_COEFFICIENTS)
+    if unknown:
+        raise ValueError(f"unknown energy coefficients: {sorted(unknown)}")
+    coefficients.update({k: float(v) for k, v in overrides.items()})
+    return coefficients
+
+@lru_cache(maxsize=None)
+def network_inventory(topology, cpu_num, hop_latency, flit_size):
+    """路由器数、端口数、链路数和平均跳数，同一网络配置只构建一次"""
+    result, _ = analyze_topology(topology, cpu_num, hop_latency, flit_size)
+    return {
+        "Routers": result["Routers"],
+        # 每条内部链路进入一个路由器端口，每条外部链路占一个端口
+        "Router_Ports": result["Int_Links"] + result["Ext_Links"],
+        "Int_Links": result["Int_Links"],
+        "Avg_Hops": result["Avg_Hops"],
+    }
+
+def estimate_energy(row, coefficients):
+    """
+    由一行结果 (配置 + 统计指标) 计算能耗，返回新增的列
+    缺少所需列时返回 {}
+    """
+    if any(row.get(c) in (None, "") for c in REQUIRED_COLUMNS):
+        return {}
+    c = coefficients
+
+    flit_size = int(row["Network_Flit_Size"])
+    cpu_num = int(row["CPU_Num"])
+    cache_kB = float(row["Cachesize_kB"])
+    seconds = float(row["SimSeconds"])
+    insts = float(row["Total_Insts"])
+
+    network = network_inventory(
+        row["Network_Topology"], cpu_num, int(row["Network_Hop_Latency"]), flit_size
+    )
+
+    # 片上网络: Garnet 的 average_hops 是经过的路由器间链路数，
+    # 每个 flit 经过 hops 条链路和 hops + 1 个路由器；统计缺失时用拓扑的平均跳数
+    flits = float(row["NoC_Flits_Injected"])
+    hops = float(row.get("NoC_Avg_Hops") or 0) or network["Avg_Hops"]
+    noc_dynamic = flits * flit_size * ((hops + 1) * c["router_pJ_per_byte"] + hops * c["link_pJ_per_byte"]) * 1e-12
+    noc_static_mW = (network["Router_Ports"] * c["router_static_mW_per_port"]
+                     + network["Int_Links"] * flit_size * c["link_static_mW_per_byte"])
+
+    # L1: 每个核一个，访问能耗随容量增长
+    access_pJ = c["l1_access_pJ_16kB"] * (cache_kB / 16) ** c["l1_access_size_exponent"]
+    l1_missing = row.get(L1_ACCESS_COLUMN) in (None, "")
+    l1_dynamic = 0.0 if l1_missing else float(row[L1_ACCESS_COLUMN]) * access_pJ * 1e-12
+    l1_static_mW = cpu_num * cache_kB * c["l1_static_mW_per_kB"]
+
+    dram_missing = any(row.get(col) in (None, "") for col in DRAM_BURST_COLUMNS)
+    dram_dynamic = 0.0 if dram_missing else (
+        float(row["DRAM_Read_Bursts"]) * c["dram_read_burst_pJ"]
+        + float(row["DRAM_Write_Bursts"]) * c["dram_write_burst_pJ"]) * 1e-12
+
+    noc_static = noc_static_mW * 1e-3 * seconds
+    l1_static = l1_static_mW * 1e-3 * seconds
+    dram_static = c["dram_static_mW"] * 1e-3 * seconds
+    total = noc_dynamic + noc_static + l1_dynamic + l1_static + dram_dynamic + dram_static
+
+    return {
+        "Energy_NoC_Dynamic_J": noc_dynamic,
+        "Energy_NoC_Static_J": noc_static,
+        "Energy_L1_Dynamic_J": None if l1_missing else l1_dynamic,
+        "L1_Dynamic_Missing": l1_missing,
+        "Energy_L1_Static_J": l1_static,
+        "Energy_DRAM_J": None if dram_missing else dram_dynamic + dram_static,
+        "DRAM_Dynamic_Missing": dram_missing,
+        "Energy_Total_J": total,
+        "Avg_Power_W": total / seconds if seconds else None,
+        # 能耗延迟积 (越小越好)
+        "EDP": total * seconds,
+        # 每瓦性能 = (指令数 / 秒) / 瓦 = 指令数 / 焦耳
+        "Perf_Per_Watt": insts / total if total else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Uncore energy, EDP and perf/W for an analysis.py results CSV")
+    parser.add_argument("results", type=str, help="results-*.csv generated by analysis.py")
+    parser.add_argument("--coefficients", type=str, default=None, help="JSON table overriding the default coefficients")
+    args = parser.parse_args()
+
+    coefficients = load_coefficients(args.coefficients)
+    rows = []
+    with open(args.results, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            print(f"Error: {args.results} has no {', '.join(missing)} column(s); "
+                  "regenerate it with the current analysis.py")
+            return
+        for row in reader:
+            energy = estimate_energy(row, coefficients)
+            if not energy:
+                print(f"Warning: missing values for {row.get('Filename')}, skipping")
+                continue
+            rows.append({"Filename": row.get("Filename"), **{k: row[k] for k in REQUIRED_COLUMNS},
+                         **{k: row.get(k) for k in [L1_ACCESS_COLUMN] + DRAM_BURST_COLUMNS}, **energy})
+
+    if not rows:
+        print("No valid data found to process.")
+        return
+
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_file = os.path.join(RESULTS_DIR, f"energy-{current_time}.csv")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+    print(f"\nReport successfully generated: {output_file}")
+    if any(row["L1_Dynamic_Missing"] for row in rows):
+        print(f"Note: no '{L1_ACCESS_COLUMN}' in the results, L1 dynamic energy is left out of Energy_Total_J "
+              "(see L1_Dynamic_Missing); regenerate the CSV with the current analysis.py to include it.")
+    if any(row["DRAM_Dynamic_Missing"] for row in rows):
+        print(f"Note: no {' / '.join(DRAM_BURST_COLUMNS)} in the results, DRAM dynamic energy is left out of "
+              "Energy_Total_J and Energy_DRAM_J is empty (see DRAM_Dynamic_Missing); "
+              "regenerate the CSV with the current analysis.py to include it.")
+    print("CHECK: compare 'Perf_Per_Watt' and 'EDP' across topologies and cache sizes, not SimSeconds alone.")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # import the m5 (gem5) library created when gem5 is built
 import m5
+import m5.debug
+import m5.trace
 
 # import all of the SimObjects
 from m5.objects import *
@@ -13,70 +15,89 @@ from common.FileSystemConfig import config_filesystem
 # of the MSI protocol
 # from msi_caches import MyCacheSystem
 from msi_garnet_caches import MyCacheSystem
-import shutil
+from analysis import format_config_name, elastic_trace_dir
+from archive import check_compression, store_stats
 import argparse
+import json
+import random
 
-def collect_stats(new_name: str = "default"):
+def collect_stats(new_name: str = "default", compression: str = None, bundle: str = None):
+    # compression: None / "gz" / "zst"; bundle: append to GENERATED_DIR/<bundle>.tar
     source_path = M5_OUT_STATS_PATH
-    destination_path = os.path.join(GENERATED_DIR, new_name)
-    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-    
+
     try:
-        shutil.move(source_path, destination_path)
+        destination_path = store_stats(source_path, GENERATED_DIR, new_name, compression, bundle)
         print(f"move: {source_path} -> {destination_path}")
             
     except Exception as e:
         print(f"fail to move: {e}")
+        if compression is None and bundle is None:
+            return
+        # never leave the only copy in m5out, where the next run overwrites it
+        try:
+            destination_path = store_stats(source_path, GENERATED_DIR, new_name)
+            print(f"stored uncompressed instead: {destination_path}")
+        except Exception as e:
+            print(f"fail to move: {e}")
 
-def simulate(
-    # applications
-    system_application: str = "bad_cache",
-    # cpu/cache params
-    system_cpu_num: int = 4,
-    system_cache_line_bytes: int = 64,
-    system_cache_size_kB: int = 16,
-    # network params
-    system_network_topology: str = "all2all",
-    system_network_flit_size: int = 16,
-    system_network_hop_latency: int = 1,
+def setup_coherence_trace(
+    trace_name: str,
+    cache_line_bytes: int,
+    addr_start: int = 0,
+    addr_end: int = None,
+    sample_rate: float = 1.0,
+    tick_start: int = 0,
+    tick_end: int = None,
 ):
-    # create the system we are going to simulate
-    system = System()
-    system.cache_line_size.value = system_cache_line_bytes
+    # Ruby's ProtocolTrace cannot be filtered by address inside gem5, so the
+    # address window and line sample rate are recorded next to the trace and
+    # applied by coherence_trace.py while it streams the file. The tick window
+    # is applied online by run_with_trace_window, which bounds the trace size.
+    trace_path = os.path.join(GENERATED_DIR, trace_name + ".out.gz")
+    os.makedirs(GENERATED_DIR, exist_ok=True)
+    with open(os.path.join(GENERATED_DIR, trace_name + ".json"), "w") as f:
+        json.dump({
+            "cache_line_bytes": cache_line_bytes,
+            "addr_start": addr_start,
+            "addr_end": addr_end,
+            "sample_rate": sample_rate,
+            "tick_start": tick_start,
+            "tick_end": tick_end,
+        }, f, indent=2)
 
-    # Set the clock frequency of the system (and all of its children)
-    system.clk_domain = SrcClockDomain()
-    system.clk_domain.clock = "1GHz"
-    system.clk_domain.voltage_domain = VoltageDomain()
+    # absolute path, so gem5 writes (gzip-compressed) straight to GENERATED_DIR
+    m5.trace.output(trace_path)
+    print(f"tracing coherence: {trace_path}")
 
-    # Set up the system
-    system.mem_mode = "timing"  # Use timing accesses
-    system.mem_ranges = [AddrRange("8192MiB")]  # Create an address range
-
-    # Create a pair of simple CPUs
-    system.cpu = [X86O3CPU() for i in range(system_cpu_num)] # X86TimingSimpleCPU()
+# exit cause when m5.simulate(ticks) stops because the tick budget ran out
+SIMULATE_LIMIT_CAUSE = "simulate() limit reached"
 
-    # Create a DDR3 memory controller and connect it to the membus
-    system.mem_ctrl = MemCtrl()
-    system.mem_ctrl.dram = DDR3_1600_8x8()
-    system.mem_ctrl.dram.range = system.mem_ranges[0]
+def run_with_trace_window(trace: bool, tick_start: int = 0, tick_end: int = None):
+    # Simulate in segments and enable ProtocolTrace only inside
+    # [tick_start, tick_end), so nothing outside the window reaches the disk.
+    # Returns the exit event that ended the simulation.
+    if not trace:
+        return m5.simulate()
+    flag = m5.debug.flags["ProtocolTrace"]
 
-    # create the interrupt controller for the CPU and connect to the membus
-    for cpu in system.cpu:
-        cpu.createInterruptController()
+    if tick_start > m5.curTick():
+        exit_event = m5.simulate(tick_start - m5.curTick())
+        if exit_event.getCause() != SIMULATE_LIMIT_CAUSE:
+            print("simulation ended before the trace window opened")
+            return exit_event
 
-    # Create the Ruby System
-    system.ruby = MyCacheSystem()
-    system.ruby.setup(
-        system, 
-        system.cpu, 
-        [system.mem_ctrl],
-        network_topology=system_network_topology,
-        network_flit_size=system_network_flit_size,
-        network_hop_latency=system_network_hop_latency,
-        cache_size=system_cache_size_kB
-    )
+    flag.enable()
+    print(f"coherence trace on @ tick {m5.curTick()}")
+    if tick_end is None:
+        return m5.simulate()
+    exit_event = m5.simulate(max(tick_end - m5.curTick(), 0))
+    flag.disable()
+    print(f"coherence trace off @ tick {m5.curTick()}")
+    if exit_event.getCause() != SIMULATE_LIMIT_CAUSE:
+        return exit_event
+    return m5.simulate()
 
+def setup_workload(system, system_application: str):
     # Run application and use the compiled ISA to find the binary
     # grab the specific path to the binary
     if system_application == "GeMM":
@@ -118,8 +139,6 @@ def simulate(
     else:
         raise Exception("invalid application")
 
-    
-
     # Create a process for a simple "multi-threaded" application
     process = Process()
     # Set the command
@@ -135,40 +154,251 @@ def simulate(
     # Set up the pseudo file system for the threads function above
     config_filesystem(system)
 
+# cpu models selectable with --cpu-type; o3 is the detailed default,
+# timing/minor are much cheaper to simulate (see simulate_screen.py)
+CPU_MODELS = {
+    "o3": X86O3CPU,
+    "minor": X86MinorCPU,
+    "timing": X86TimingSimpleCPU,
+}
+
+def perturb_memory(mem_ctrl, repetition: int, jitter_ps: int):
+    # Add a small, repetition-dependent offset to the controller frontend
+    # latency so repeated runs do not retrace exactly the same timing.
+    jitter = random.Random(repetition).randint(0, jitter_ps)
+    mem_ctrl.static_frontend_latency = f"{10000 + jitter}ps"  # default is 10ns
+    print(f"repetition {repetition}: memory frontend latency +{jitter}ps")
+
+# the capture run is stats-keyed under its own cpu type, it is not an o3 data point
+CAPTURE_CPU_TYPE = "o3_capture"
+
+def attach_trace_capture(cpus, system_application: str, system_cpu_num: int):
+    # Record per-core elastic traces (gzip protobuf: instruction fetches plus
+    # data requests with timestamps and dependencies). As in gem5's
+    # CpuConfig.config_etrace, the ROB and load/store queues are made very
+    # large so resource stalls are not recorded as compute delay.
+    trace_dir = elastic_trace_dir(system_application, system_cpu_num)
+    os.makedirs(trace_dir, exist_ok=True)
+    for i, cpu in enumerate(cpus):
+        cpu.numROBEntries = 512
+        cpu.LQEntries = 128
+        cpu.SQEntries = 128
+        cpu.traceListener = ElasticTrace(
+            instFetchTraceFile=os.path.join(trace_dir, f"fetchtrace{i}.proto.gz"),
+            dataDepTraceFile=os.path.join(trace_dir, f"deptrace{i}.proto.gz"),
+            depWindowSize=3 * cpu.numROBEntries,
+        )
+    print(f"capturing elastic traces: {trace_dir}")
+
+def create_trace_players(system_application: str, system_cpu_num: int):
+    trace_dir = elastic_trace_dir(system_application, system_cpu_num)
+    if not os.path.isdir(trace_dir):
+        raise Exception(f"no captured trace in {trace_dir}, run with --capture-trace first")
+    return [
+        TraceCPU(
+            instTraceFile=os.path.join(trace_dir, f"fetchtrace{i}.proto.gz"),
+            dataTraceFile=os.path.join(trace_dir, f"deptrace{i}.proto.gz"),
+            # finish when every core has replayed its whole trace
+            enableEarlyExit=False,
+        )
+        for i in range(system_cpu_num)
+    ]
+
+def simulate(
+    # applications
+    system_application: str = "bad_cache",
+    # cpu/cache params
+    system_cpu_num: int = 4,
+    system_cpu_type: str = "o3",
+    system_cache_line_bytes: int = 64,
+    system_cache_size_kB: int = 16,
+    # network params
+    system_network_topology: str = "all2all",
+    system_network_flit_size: int = 16,
+    system_network_hop_latency: int = 1,
+    system_network_vcs_per_vnet: int = 4,
+    system_network_buffers_per_data_vc: int = 4,
+    system_network_buffers_per_ctrl_vc: int = 1,
+    # coherence trace params
+    system_trace_coherence: bool = False,
+    system_trace_addr_start: int = 0,
+    system_trace_addr_end: int = None,
+    system_trace_sample_rate: float = 1.0,
+    system_trace_tick_start: int = 0,
+    system_trace_tick_end: int = None,
+    # memory trace capture (replay with system_cpu_type="trace")
+    system_capture_trace: bool = False,
+    # repeated runs: repetition 0 is the unperturbed run, later ones perturb
+    # the random seed, ruby message timing and the memory controller latency
+    system_repetition: int = 0,
+    system_mem_jitter_ps: int = 1000,
+    # stats archival
+    stats_compression: str = None,
+    stats_bundle: str = None,
+):
+    config_name = format_config_name({
+        "Application": system_application,
+        "CPU_Num": system_cpu_num,
+        "Cacheline_Size_Bytes": system_cache_line_bytes,
+        "Cachesize_kB": system_cache_size_kB,
+        "Network_Topology": system_network_topology,
+        "Network_Flit_Size": system_network_flit_size,
+        "Network_Hop_Latency": system_network_hop_latency,
+        "Network_VCs_Per_VNet": system_network_vcs_per_vnet,
+        "Network_Buffers_Per_Data_VC": system_network_buffers_per_data_vc,
+        "Network_Buffers_Per_Ctrl_VC": system_network_buffers_per_ctrl_vc,
+        "CPU_Type": CAPTURE_CPU_TYPE if system_capture_trace else system_cpu_type,
+        "Repetition": system_repetition,
+    })
+
+    # create the system we are going to simulate
+    system = System()
+    system.cache_line_size.value = system_cache_line_bytes
+
+    # Set the clock frequency of the system (and all of its children)
+    system.clk_domain = SrcClockDomain()
+    system.clk_domain.clock = "1GHz"
+    system.clk_domain.voltage_domain = VoltageDomain()
+
+    # Set up the system
+    system.mem_mode = "timing"  # Use timing accesses
+    system.mem_ranges = [AddrRange("8192MiB")]  # Create an address range
+
+    # Create the CPUs
+    if system_cpu_type == "trace":
+        system.cpu = create_trace_players(system_application, system_cpu_num)
+    elif system_cpu_type in CPU_MODELS:
+        system.cpu = [CPU_MODELS[system_cpu_type]() for i in range(system_cpu_num)]
+    else:
+        raise Exception("invalid cpu type")
+
+    if system_capture_trace:
+        if system_cpu_type != "o3":
+            raise Exception("elastic traces can only be captured from the o3 cpu")
+        attach_trace_capture(system.cpu, system_application, system_cpu_num)
+
+    # Create a DDR3 memory controller and connect it to the membus
+    system.mem_ctrl = MemCtrl()
+    system.mem_ctrl.dram = DDR3_1600_8x8()
+    system.mem_ctrl.dram.range = system.mem_ranges[0]
+    if system_repetition > 0:
+        perturb_memory(system.mem_ctrl, system_repetition, system_mem_jitter_ps)
+
+    # create the interrupt controller for the CPU and connect to the membus
+    for cpu in system.cpu:
+        if system_cpu_type != "trace":
+            cpu.createInterruptController()
+
+    # Create the Ruby System
+    system.ruby = MyCacheSystem()
+    system.ruby.setup(
+        system, 
+        system.cpu, 
+        [system.mem_ctrl],
+        network_topology=system_network_topology,
+        network_flit_size=system_network_flit_size,
+        network_hop_latency=system_network_hop_latency,
+        network_vcs_per_vnet=system_network_vcs_per_vnet,
+        network_buffers_per_data_vc=system_network_buffers_per_data_vc,
+        network_buffers_per_ctrl_vc=system_network_buffers_per_ctrl_vc,
+        cache_size=system_cache_size_kB
+    )
+
+    if system_repetition > 0:
+        # random delays on unordered message buffers, seeded below
+        system.ruby.randomization = True
+
+    # trace players replay recorded requests, there is no process to run
+    if system_cpu_type != "trace":
+        setup_workload(system, system_application)
+
     # set up the root SimObject and start the simulation
     root = Root(full_system=False, system=system)
     # instantiate all of the objects we've created above
     m5.instantiate()
 
+    if system_repetition > 0:
+        m5.core.seedRandom(system_repetition)
+
+    if system_trace_coherence:
+        setup_coherence_trace(
+            "trace-" + config_name,
+            system_cache_line_bytes,
+            addr_start=system_trace_addr_start,
+            addr_end=system_trace_addr_end,
+            sample_rate=system_trace_sample_rate,
+            tick_start=system_trace_tick_start,
+            tick_end=system_trace_tick_end,
+        )
+
     print("Beginning simulation!")
-    exit_event = m5.simulate()
+    exit_event = run_with_trace_window(
+        system_trace_coherence, system_trace_tick_start, system_trace_tick_end
+    )
     print(f"Exiting @ tick {m5.curTick()} because {exit_event.getCause()}")
 
     # move stats file
-    collect_stats(
-        "-".join(["stats",system_application, str(system_cpu_num), str(system_cache_line_bytes), str(system_cache_size_kB), system_network_topology, str(system_network_flit_size), str(system_network_hop_latency)])+".txt"
-    )
+    collect_stats("stats-" + config_name + ".txt", stats_compression, stats_bundle)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--application", type=str, default="threads")
     parser.add_argument("--cpu-num", type=int, default=1) 
+    parser.add_argument("--cpu-type", type=str, default="o3", choices=list(CPU_MODELS) + ["trace"])
+    # record elastic traces for later --cpu-type trace replays
+    parser.add_argument("--capture-trace", action="store_true")
     parser.add_argument("--cacheline-byte", type=int, default=64)
     parser.add_argument("--topology", type=str, default="all2all")
     parser.add_argument("--flit-size", type=int, default=16)
     parser.add_argument("--hop-latency", type=int, default=1)
     parser.add_argument("--cache-size", type=int, default=16)
+    parser.add_argument("--vcs-per-vnet", type=int, default=4)
+    parser.add_argument("--buffers-per-data-vc", type=int, default=4)
+    parser.add_argument("--buffers-per-ctrl-vc", type=int, default=1)
+    # coherence trace (see coherence_trace.py)
+    parser.add_argument("--trace-coherence", action="store_true")
+    parser.add_argument("--trace-addr-start", type=lambda x: int(x, 0), default=0)
+    parser.add_argument("--trace-addr-end", type=lambda x: int(x, 0), default=None)
+    parser.add_argument("--trace-sample-rate", type=float, default=1.0)
+    # only trace ticks in [start, end); bounds the size of the trace on disk
+    parser.add_argument("--trace-tick-start", type=int, default=0)
+    parser.add_argument("--trace-tick-end", type=int, default=None)
+    parser.add_argument("--repetition", type=int, default=0)
+    parser.add_argument("--mem-jitter-ps", type=int, default=1000)
+    # stats archival: compress the stats file and/or append it to a per-sweep tar
+    parser.add_argument("--compress", type=str, default=None, choices=["gz", "zst"])
+    parser.add_argument("--bundle", type=str, default=None)
     args = parser.parse_args()
+    # fail before simulating, not after
+    try:
+        check_compression(args.compress)
+    except (RuntimeError, ValueError) as e:
+        parser.error(str(e))
     
     simulate(
         system_application=args.application,
         system_cpu_num=args.cpu_num,
+        system_cpu_type=args.cpu_type,
         system_cache_line_bytes=args.cacheline_byte,
         system_network_topology=args.topology,
         system_network_flit_size=args.flit_size,
         system_network_hop_latency=args.hop_latency,
-        system_cache_size_kB=args.cache_size
+        system_network_vcs_per_vnet=args.vcs_per_vnet,
+        system_network_buffers_per_data_vc=args.buffers_per_data_vc,
+        system_network_buffers_per_ctrl_vc=args.buffers_per_ctrl_vc,
+        system_cache_size_kB=args.cache_size,
+        system_trace_coherence=args.trace_coherence,
+        system_trace_addr_start=args.trace_addr_start,
+        system_trace_addr_end=args.trace_addr_end,
+        system_trace_sample_rate=args.trace_sample_rate,
+        system_trace_tick_start=args.trace_tick_start,
+        system_trace_tick_end=args.trace_tick_end,
+        system_capture_trace=args.capture_trace,
+        system_repetition=args.repetition,
+        system_mem_jitter_ps=args.mem_jitter_ps,
+        stats_compression=args.compress,
+        stats_bundle=args.bundle
     )
 
 main()
\ No newline at end of file
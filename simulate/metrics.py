@@ -0,0 +1,295 @@
+import re
+import ast
+import itertools
+from functools import lru_cache
+
+# 声明式指标目录
+# 每一项要么是统计项提取 (stat + reduce)，要么是衍生指标 (expr)
+#   name:    输出列名
+#   stat:    统计项名的 glob，例如 system.cpu*.ipc
+#            * 和 ? 只匹配一段名字 (不跨越 "."), 因此不会命中 system.cpu0.commitStats0.ipc 这类嵌套统计项
+#   reduce:  sum / max / mean / vector (vector 保留全部数值，供衍生指标使用)
+#   default: 没有任何统计项命中时的取值 (默认为 0，vector 为 [])
+#   expr:    衍生指标表达式，可以直接引用前面定义的指标名，
+#            名字不是合法标识符时用 m["..."] 引用
+#   hidden:  只作为中间量，不输出到结果表
+# 衍生指标只能引用在它之前定义的指标
+METRIC_CATALOG = [
+    # --- 基础概览 ---
+    {"name": "SimSeconds", "stat": "simSeconds", "reduce": "sum"},
+    {"name": "Total_Insts", "stat": "simInsts", "reduce": "sum", "default": 1},
+    # 模拟器本身的运行时间 (用于衡量快速模式的加速比)
+    {"name": "Host_Seconds", "stat": "hostSeconds", "reduce": "sum"},
+    {"name": "AvgIPC", "stat": "system.cpu*.ipc", "reduce": "mean"},
+    {"name": "CPU_Max_Cycles", "stat": "system.cpu*.numCycles", "reduce": "max", "hidden": True},
+    {"name": "CPU_Avg_Cycles", "stat": "system.cpu*.numCycles", "reduce": "mean", "hidden": True},
+    # 负载均衡: 最慢的核 / 平均, 理想值为 1.0
+    {"name": "LoadBalance", "expr": "CPU_Max_Cycles / CPU_Avg_Cycles if CPU_Avg_Cycles else 0"},
+
+    # --- 关键一致性事件 (Coherence Events) ---
+    # FwdGetM: 其他核想写，请求转发给拥有者 -> 意味着写竞争 (True Sharing / False Sharing)
+    {"name": "Coh_FwdGetM (Write Contention)", "stat": "system.ruby.L1Cache_Controller.FwdGetM::total", "reduce": "sum"},
+    # FwdGetS: 其他核想读，请求转发 -> 意味着读共享
+    {"name": "Coh_FwdGetS (Read Sharing)", "stat": "system.ruby.L1Cache_Controller.FwdGetS::total", "reduce": "sum"},
+    # Inv: 失效消息 -> 意味着有人在写共享数据
+    {"name": "Coh_Invalidations", "stat": "system.ruby.L1Cache_Controller.Inv::total", "reduce": "sum"},
+    # Writebacks: 数据写回下级缓存
+    {"name": "Coh_Writebacks (PutAck)", "stat": "system.ruby.L1Cache_Controller.PutAck::total", "reduce": "sum"},
+    # Locked RMW: 原子指令导致的锁操作 (Read 和 Write 两种求和)
+    {"name": "Coh_Locked_RMW", "stat": "system.ruby.RequestType.Locked_RMW_*::total", "reduce": "sum"},
+
+    # --- 控制器瓶颈 (Controller Bottlenecks) ---
+    # 所有控制器中最忙的周期数，代表系统"最堵"的程度
+    {"name": "Max_Controller_BusyCycles", "stat": "system.ruby.controllers*.fullyBusyCycles", "reduce": "max"},
+    # 输入队列平均阻塞时间的最大值，看哪个核被阻塞最久
+    {"name": "Max_MandatoryQueue_Stall", "stat": "system.ruby.controllers*.mandatoryQueue.m_avg_stall_time", "reduce": "max"},
+
+    # --- 片上网络 (Interconnect / NoC) ---
+    # Gem5 输出为 | vnet0 | vnet1 | vnet2 |，VNet 0/1 是控制，VNet 2 是数据
+    {"name": "NoC_VNet_Lat", "stat": "system.ruby.network.average_flit_vnet_latency", "reduce": "vector", "hidden": True},
+    {"name": "NoC_Control_Lat", "expr": "mean(NoC_VNet_Lat[:2])"},
+    # 数据消息的平均延迟 - 如果带宽不足，这个值会飙升
+    {"name": "NoC_Data_Lat", "expr": "at(NoC_VNet_Lat, 2)"},
+    {"name": "NoC_Flits_Injected", "stat": "system.ruby.network.flits_injected::total", "reduce": "sum"},
+    {"name": "NoC_Avg_Hops", "stat": "system.ruby.network.average_hops", "reduce": "sum"},
+
+    # --- 内存带宽 ---
+    {"name": "DRAM_Read_BW", "stat": "system.mem_ctrl.dram.bwRead::total", "reduce": "sum"},
+    {"name": "DRAM_Write_BW", "stat": "system.mem_ctrl.dram.bwWrite::total", "reduce": "sum"},
+    {"name": "DRAM_Read_Bursts", "stat": "system.mem_ctrl.dram.readBursts", "reduce": "sum"},
+    {"name": "DRAM_Write_Bursts", "stat": "system.mem_ctrl.dram.writeBursts", "reduce": "sum"},
+
+    # --- L1 访问次数 (能耗模型使用，目录控制器没有 cacheMemory) ---
+    {"name": "L1_Demand_Accesses", "stat": "system.ruby.controllers*.cacheMemory.m_demand_accesses", "reduce": "sum"},
+
+    # --- 衍生指标 (Insight) ---
+    # 每1000条指令的竞争次数，值高说明每执行少量指令就会触发昂贵的一致性操作
+    {"name": "Contention_Intensity",
+     "expr": "(m['Coh_FwdGetM (Write Contention)'] + Coh_Invalidations) / Total_Insts * 1000"},
+    # 伪共享/真竞争 严重程度
+    {"name": "Write_Contention_Count", "expr": "m['Coh_FwdGetM (Write Contention)']"},
+    # Mandatory Queue Stall Time 高说明 CPU 等待 L1 响应的时间长
+    {"name": "CPU_Stall_Severity", "expr": "Max_MandatoryQueue_Stall"},
+]
+
+REDUCTIONS = ("sum", "max", "mean", "vector")
+
+def mean(values):
+    values = list(values)
+    return sum(values) / len(values) if values else 0
+
+def at(values, index, default=0):
+    return values[index] if -len(values) <= index < len(values) else default
+
+# 衍生指标表达式可以使用的函数
+EXPR_FUNCTIONS = {
+    "mean": mean,
+    "at": at,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "len": len,
+    "abs": abs,
+}
+
+def parse_number(token):
+    """把统计值转换为 int 或 float，无法解析时返回 None"""
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+def glob_literal_prefix(pattern):
+    """glob 中第一个通配符之前的字面量部分"""
+    for i, c in enumerate(pattern):
+        if c in "*?[":
+            return pattern[:i]
+    return pattern
+
+def glob_to_regex(pattern):
+    """
+    把统计项名的 glob 转换为 bytes 正则 (整名匹配)
+    与 fnmatch 不同，* 和 ? 不匹配 "."，只在一段名字内通配
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            parts.append(r"[^.\s]*")
+        elif c == "?":
+            parts.append(r"[^.\s]")
+        elif c == "[" and "]" in pattern[i + 2:]:
+            close = pattern.index("]", i + 2)
+            body = pattern[i + 1:close]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", r"\\") + "]")
+            i = close
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+def expr_references(expr):
+    """找出表达式引用的指标名 (直接名字和 m["..."] 两种写法)"""
+    names = set()
+    for node in ast.walk(ast.parse(expr, mode="eval")):
+        if isinstance(node, ast.Name) and node.id not in EXPR_FUNCTIONS and node.id != "m":
+            names.add(node.id)
+        elif (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+              and node.value.id == "m" and isinstance(node.slice, ast.Constant)):
+            names.add(node.slice.value)
+    return names
+
+def stat_name_alternation(globs):
+    """
+    把多个 glob 合并成一个正则分支: 先按字面量前缀建前缀树，再把树展开为嵌套分支
+    共同前缀只出现一次，正则引擎在不匹配的前缀处立即放弃，例如各 CPU 的 O3 统计行
+    """
+    trie = {}
+    for pattern in globs:
+        prefix = glob_literal_prefix(pattern)
+        node = trie
+        for c in prefix:
+            node = node.setdefault(c, {})
+        node.setdefault(None, set()).add(glob_to_regex(pattern[len(prefix):]))
+
+    def render(node):
+        branches = sorted(node.get(None, ()))
+        for c, child in sorted((k, v) for k, v in node.items() if k is not None):
+            literal = c
+            # 压缩单链路径
+            while None not in child and len(child) == 1:
+                (c, child), = child.items()
+                literal += c
+            branches.append(re.escape(literal) + render(child))
+        if len(branches) == 1:
+            return branches[0]
+        # 较长的分支在前，空分支 (整名已结束) 放在最后
+        branches.sort(key=lambda b: b == "")
+        return "(?:" + "|".join(branches) + ")"
+
+    return render(trie)
+
+class MetricPlan:
+    """
+    由指标目录编译得到的提取计划
+    所有 glob 合并为一个正则，用 finditer 在 C 层一次扫描统计块即可得到全部指标
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.stat_entries = []
+        self.derived = []
+        self.hidden = set()
+        self.name_regexes = []
+        # 统计项名 -> 命中的 stat_entries 下标，同名统计项在文件之间重复出现
+        self._resolved = {}
+
+        defined = set()
+        for entry in catalog:
+            name = entry["name"]
+            if entry.get("hidden"):
+                self.hidden.add(name)
+
+            if "expr" in entry:
+                missing = expr_references(entry["expr"]) - defined
+                if missing:
+                    raise ValueError(f"metric '{name}' references undefined metrics: {sorted(missing)}")
+                self.derived.append((name, compile(entry["expr"], name, "eval")))
+            elif "stat" in entry:
+                if entry["reduce"] not in REDUCTIONS:
+                    raise ValueError(f"metric '{name}' has invalid reduction '{entry['reduce']}'")
+                self.stat_entries.append(entry)
+                self.name_regexes.append(re.compile((glob_to_regex(entry["stat"]) + r"\Z").encode()))
+            else:
+                raise ValueError(f"metric '{name}' needs either 'stat' or 'expr'")
+            defined.add(name)
+
+        # 一行统计: <统计项名> <空白> <数值部分>
+        # 以换行符开头让正则引擎用快速字符搜索跳到下一行，块的第一行单独匹配
+        line = "(" + stat_name_alternation(e["stat"] for e in self.stat_entries) + r")[ \t]+([^\n]*)"
+        self.line_regex = re.compile(("\n" + line).encode())
+        self.first_line_regex = re.compile(line.encode())
+
+    def _lookup(self, name):
+        """统计项名命中的 stat_entries 下标 (结果缓存)"""
+        indices = self._resolved.get(name)
+        if indices is None:
+            indices = tuple(i for i, r in enumerate(self.name_regexes) if r.match(name))
+            self._resolved[name] = indices
+        return indices
+
+    def new_values(self):
+        return [[] for _ in self.stat_entries]
+
+    def scan(self, buf, start, end, values):
+        """把 buf[start:end] 中命中的统计行的数值累加到 values (start 应是一行的开头)"""
+        first = self.first_line_regex.match(buf, start, end)
+        matches = self.line_regex.finditer(buf, start, end)
+        for m in itertools.chain([first] if first else [], matches):
+            line_values = None
+            for index in self._lookup(m.group(1)):
+                if line_values is None:
+                    line_values = parse_stat_values(m.group(2))
+                values[index].extend(line_values)
+
+    def extract(self, buf, start, end):
+        """
+        单次扫描 buf[start:end] 中的统计行，返回 {指标名: 值}
+        buf 可以是 bytes 或 mmap
+        """
+        values = self.new_values()
+        self.scan(buf, start, end, values)
+        return self.evaluate(values)
+
+    def evaluate(self, values):
+        data = {}
+        for entry, entry_values in zip(self.stat_entries, values):
+            data[entry["name"]] = reduce_values(entry, entry_values)
+
+        for name, code in self.derived:
+            namespace = dict(EXPR_FUNCTIONS)
+            namespace.update({k: v for k, v in data.items() if k.isidentifier()})
+            namespace["m"] = data
+            data[name] = eval(code, {"__builtins__": {}}, namespace)
+
+        # 按目录顺序输出，去掉中间量
+        return {
+            entry["name"]: data[entry["name"]]
+            for entry in self.catalog if entry["name"] not in self.hidden
+        }
+
+def parse_stat_values(raw):
+    """
+    解析统计项名之后的数值部分 (去掉 # 注释)
+    标量返回 [v]，oneline 向量 (| v0 | v1 | ...) 返回全部元素
+    """
+    text = raw.decode(errors='replace').split('#', 1)[0]
+    if '|' in text:
+        tokens = [t.strip() for t in text.split('|')]
+    else:
+        tokens = text.split()[:1]
+    return [v for v in (parse_number(t) for t in tokens if t) if v is not None]
+
+def reduce_values(entry, values):
+    reduction = entry["reduce"]
+    if reduction == "vector":
+        return values
+    if not values:
+        return entry.get("default", 0)
+    if reduction == "sum":
+        return sum(values)
+    if reduction == "max":
+        return max(values)
+    return mean(values)
+
+@lru_cache(maxsize=None)
+def get_metric_plan():
+    """默认指标目录的提取计划，只编译一次"""
+    return MetricPlan(METRIC_CATALOG)
@@ -62,15 +62,24 @@ class MyCacheSystem(RubySystem):
         network_topology: str = "all2all",
         network_flit_size: int = 16,
         network_hop_latency: int = 1,
+        network_vcs_per_vnet: int = 4,
+        network_buffers_per_data_vc: int = 4,
+        network_buffers_per_ctrl_vc: int = 1,
         # cache params
         cache_size: int = 16
     ):
         """Set up the Ruby cache subsystem with Garnet network."""
         # Ruby's global network - now using Garnet
+        network_params = dict(
+            flit_size=network_flit_size,
+            vcs_per_vnet=network_vcs_per_vnet,
+            buffers_per_data_vc=network_buffers_per_data_vc,
+            buffers_per_ctrl_vc=network_buffers_per_ctrl_vc,
+        )
         if network_topology == "all2all":
-            self.network = All2AllNetwork(self, flit_size=network_flit_size)
+            self.network = All2AllNetwork(self, **network_params)
         elif network_topology == "mesh":
-            self.network = MeshNetwork(self, flit_size=network_flit_size)
+            self.network = MeshNetwork(self, **network_params)
         else:
             raise Exception("invalid network topology type")
         
@@ -114,7 +123,12 @@ class MyCacheSystem(RubySystem):
 
         # Connect CPU ports
         for i, cpu in enumerate(cpus):
-            self.sequencers[i].connectCpuPorts(cpu)
+            if isinstance(cpu, TraceCPU):
+                # trace players only have cache ports (no interrupts or MMU)
+                cpu.icache_port = self.sequencers[i].in_ports
+                cpu.dcache_port = self.sequencers[i].in_ports
+            else:
+                self.sequencers[i].connectCpuPorts(cpu)
 
 
 class L1Cache(MSI_L1Cache_Controller):
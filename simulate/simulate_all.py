@@ -2,42 +2,169 @@ import subprocess
 import os
 from env import *
 import time
+import argparse
+from analysis import format_config_name, parse_file, relative_ci, summarize
+from archive import BUNDLE_SEPARATOR, check_compression, compressed_name, load_bundle_index
 
-def run_single_test(application, cpu_num, topology, hop_latency, cacheline_byte, cache_size_kB):
+def run_single_test(application, cpu_num, topology, hop_latency, cacheline_byte, cache_size_kB,
+                    flit_size=16, vcs_per_vnet=4, buffers_per_data_vc=4, buffers_per_ctrl_vc=1,
+                    cpu_type="o3", capture_trace=False,
+                    compress=None, bundle=None, repetition=0):
     cmd = [
         M5_EXE_PATH,
         MAIN_PATH,
         "--application", application,
         "--cpu-num", str(cpu_num),
+        "--cpu-type", cpu_type,
         "--topology", topology,
         "--hop-latency", str(hop_latency),
         "--cacheline-byte", str(cacheline_byte),
-        "--cache-size", str(cache_size_kB)
+        "--cache-size", str(cache_size_kB),
+        "--flit-size", str(flit_size),
+        "--vcs-per-vnet", str(vcs_per_vnet),
+        "--buffers-per-data-vc", str(buffers_per_data_vc),
+        "--buffers-per-ctrl-vc", str(buffers_per_ctrl_vc)
     ]
+    if capture_trace:
+        cmd.append("--capture-trace")
+    if repetition:
+        cmd += ["--repetition", str(repetition)]
+    if compress:
+        cmd += ["--compress", compress]
+    if bundle:
+        cmd += ["--bundle", bundle]
     
     print(f"Running: {' '.join(cmd)}")
     os.system(' '.join(cmd))
 
+def stats_path(application, cpu_num, topology, hop_latency, cacheline_byte, cache_size_kB,
+               flit_size=16, vcs_per_vnet=4, buffers_per_data_vc=4, buffers_per_ctrl_vc=1,
+               cpu_type="o3", compress=None, bundle=None, repetition=0):
+    """where main.py leaves the stats file of the matching run_single_test call"""
+    config_name = format_config_name({
+        "Application": application,
+        "CPU_Num": cpu_num,
+        "Cacheline_Size_Bytes": cacheline_byte,
+        "Cachesize_kB": cache_size_kB,
+        "Network_Topology": topology,
+        "Network_Flit_Size": flit_size,
+        "Network_Hop_Latency": hop_latency,
+        "Network_VCs_Per_VNet": vcs_per_vnet,
+        "Network_Buffers_Per_Data_VC": buffers_per_data_vc,
+        "Network_Buffers_Per_Ctrl_VC": buffers_per_ctrl_vc,
+        "CPU_Type": cpu_type,
+        "Repetition": repetition,
+    })
+    name = compressed_name("stats-" + config_name + ".txt", compress)
+    if bundle:
+        return os.path.join(GENERATED_DIR, bundle + ".tar") + BUNDLE_SEPARATOR + name
+    return os.path.join(GENERATED_DIR, name)
+
+def sweep_configs(application):
+    """all sweep points of one application, as run_single_test keyword arguments"""
+    configs = []
+
+    def add(**kwargs):
+        config = dict(application=application, cpu_num=4, topology="mesh", hop_latency=1,
+                      cacheline_byte=64, cache_size_kB=16)
+        config.update(kwargs)
+        if config not in configs:
+            configs.append(config)
+
+    # 1. scale
+    for cpu_num in [1,2,4]:
+        add(cpu_num=cpu_num, topology="mesh")
+        add(cpu_num=cpu_num, topology="all2all")
+
+    # 2. slow down
+    for hop_latency in [1, 2, 4]:
+        add(hop_latency=hop_latency)
+
+    # 3. cacheline size
+    for cacheline_size in [32, 64, 128, 256]:
+        add(cacheline_byte=cacheline_size)
+
+    # 4. data reuse
+    for cache_size_kB in [4, 64, 256]:
+        add(cache_size_kB=cache_size_kB)
+
+    # 5. network bandwidth
+    for flit_size in [8, 32]:
+        add(flit_size=flit_size)
+    for vcs_per_vnet in [1, 2]:
+        add(vcs_per_vnet=vcs_per_vnet)
+    for buffers_per_data_vc in [2, 8]:
+        add(buffers_per_data_vc=buffers_per_data_vc)
+
+    return configs
+
+def stats_exists(path):
+    if BUNDLE_SEPARATOR in path:
+        bundle_path, name = path.split(BUNDLE_SEPARATOR, 1)
+        return os.path.exists(bundle_path) and name in load_bundle_index(bundle_path)
+    return os.path.exists(path)
+
+def run_repeated(config, metric="SimSeconds", target_ci=0.02, min_repetitions=3,
+                 max_repetitions=10, reuse=False, **kwargs):
+    """
+    run one config until the 95% CI half-width of `metric` is within
+    target_ci of its mean, between min_repetitions and max_repetitions runs;
+    stable configs stop at min_repetitions, noisy ones get the extra runs;
+    repetitions are numbered from 1 so every run is perturbed -- repetition 0
+    is the plain unperturbed run and is not part of the sample
+    """
+    values = []
+    for repetition in range(1, max_repetitions + 1):
+        path = stats_path(**config, repetition=repetition,
+                          compress=kwargs.get("compress"), bundle=kwargs.get("bundle"))
+        if not (reuse and stats_exists(path)):
+            run_single_test(**config, repetition=repetition, **kwargs)
+        row = parse_file(path) if stats_exists(path) else None
+        if row is None:
+            print(f"Warning: no stats for {path}")
+            continue
+        values.append(float(row[metric]))
+
+        width = relative_ci(values)
+        if len(values) >= min_repetitions and width is not None and width <= target_ci:
+            break
+
+    if values:
+        mean, std, half_width = summarize(values)
+        print(f"{config['application']}: {metric} = {mean:.6g}"
+              + (f" +- {half_width:.3g} (95% CI)" if half_width is not None else "")
+              + f" over {len(values)} runs")
+    return values
+
 def main():
+    parser = argparse.ArgumentParser()
+    # archive the stats files: compress each one, and/or bundle each application's sweep into one tar
+    parser.add_argument("--compress", type=str, default=None, choices=["gz", "zst"])
+    parser.add_argument("--bundle", action="store_true")
+    # repeated runs with perturbed timing; adaptive between --min-repetitions and --repetitions
+    parser.add_argument("--repetitions", type=int, default=1)
+    parser.add_argument("--min-repetitions", type=int, default=3)
+    parser.add_argument("--target-ci", type=float, default=0.02,
+                        help="stop repeating once the 95%% CI half-width is within this fraction of the mean")
+    parser.add_argument("--ci-metric", type=str, default="SimSeconds")
+    parser.add_argument("--reuse", action="store_true", help="skip repetitions whose stats file already exists")
+    args = parser.parse_args()
+    # fail before the sweep starts, not after the first simulation
+    try:
+        check_compression(args.compress)
+    except (RuntimeError, ValueError) as e:
+        parser.error(str(e))
 
     for application in [ "FFT", "bad_cache"]: #, "Transpose_GeMM", "Matrix_symm"]:
-        
-        # 1. scale
-        for cpu_num in [1,2,4]:
-            run_single_test(application, cpu_num, "mesh", 1, 64, 16)
-            run_single_test(application, cpu_num, "all2all", 1, 64, 16)
-
-        # 2. slow down
-        for hop_latency in [1, 2, 4]:
-            run_single_test(application, 4, "mesh", hop_latency, 64, 16)
-
-        # 3. cacheline size
-        for cacheline_size in [32, 64, 128, 256]:
-            run_single_test(application, 4, "mesh", 1, cacheline_size, 16)
-
-        # 4. data reuse
-        for cache_size_kB in [4, 64, 256]:
-            run_single_test(application, 4, "mesh", 1, 64, cache_size_kB)
+        # stable name, so a later --reuse sweep finds the runs already in the bundle
+        bundle = f"sweep-{application}" if args.bundle else None
+        for config in sweep_configs(application):
+            if args.repetitions > 1:
+                run_repeated(config, args.ci_metric, args.target_ci,
+                             min(args.min_repetitions, args.repetitions), args.repetitions,
+                             args.reuse, compress=args.compress, bundle=bundle)
+            else:
+                run_single_test(**config, compress=args.compress, bundle=bundle)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,16 +3,23 @@ import os
 from env import *
 import time
 
-def run_single_test(application, cpu_num, topology, hop_latency, cacheline_byte, cache_size_kB):
+def run_single_test(application, cpu_num, topology, hop_latency, cacheline_byte, cache_size_kB,
+                    flit_size=16, vcs_per_vnet=4, buffers_per_data_vc=4, buffers_per_ctrl_vc=1,
+                    cpu_type="o3"):
     cmd = [
         M5_EXE_PATH,
         MAIN_PATH,
         "--application", application,
         "--cpu-num", str(cpu_num),
+        "--cpu-type", cpu_type,
         "--topology", topology,
         "--hop-latency", str(hop_latency),
         "--cacheline-byte", str(cacheline_byte),
-        "--cache-size", str(cache_size_kB)
+        "--cache-size", str(cache_size_kB),
+        "--flit-size", str(flit_size),
+        "--vcs-per-vnet", str(vcs_per_vnet),
+        "--buffers-per-data-vc", str(buffers_per_data_vc),
+        "--buffers-per-ctrl-vc", str(buffers_per_ctrl_vc)
     ]
     
     print(f"Running: {' '.join(cmd)}")
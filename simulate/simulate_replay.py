@@ -0,0 +1,164 @@
+import os
+import csv
+import argparse
+import datetime
+from env import *
+from analysis import parse_file, elastic_trace_dir
+from compare import relative_delta, spearman
+from simulate_all import run_single_test, stats_path
+
+# 回放只改变缓存层次，这些指标用来衡量回放结果与完整 O3 运行的差距
+FIDELITY_METRICS = [
+    "SimSeconds",
+    "Coh_FwdGetM (Write Contention)",
+    "Coh_Invalidations",
+    "Coh_Writebacks (PutAck)",
+    "NoC_Flits_Injected",
+    "NoC_Data_Lat",
+    "DRAM_Read_BW",
+]
+
+CACHE_SIZES_KB = [4, 16, 64, 256]
+CACHELINE_BYTES = [32, 64, 128, 256]
+
+def replay_configs(application, cpu_num, cache_sizes, cacheline_sizes):
+    """缓存大小与缓存行大小两条扫描线 (与 simulate_all.py 的第 3、4 组一致)"""
+    configs = []
+
+    def add(**kwargs):
+        config = dict(application=application, cpu_num=cpu_num, topology="mesh", hop_latency=1,
+                      cacheline_byte=64, cache_size_kB=16)
+        config.update(kwargs)
+        if config not in configs:
+            configs.append(config)
+
+    for cache_size_kB in cache_sizes:
+        add(cache_size_kB=cache_size_kB)
+    for cacheline_byte in cacheline_sizes:
+        add(cacheline_byte=cacheline_byte)
+    return configs
+
+def capture(application, cpu_num, cacheline_byte, cache_size_kB, reuse=False):
+    """
+    每个程序只跑一次 O3 并记录 trace (ROB/LQ/SQ 加大，结果不作为 o3 数据点)
+    用最小的缓存行捕获，回放时的访存请求不会跨越更大的缓存行；
+    用最大的缓存捕获，尽量少的缺失延迟进入 trace
+    """
+    trace_dir = elastic_trace_dir(application, cpu_num)
+    if reuse and os.path.exists(os.path.join(trace_dir, "deptrace0.proto.gz")):
+        print(f"Reusing trace: {trace_dir}")
+        return True
+    run_single_test(application, cpu_num, "mesh", 1, cacheline_byte, cache_size_kB, capture_trace=True)
+    return os.path.exists(os.path.join(trace_dir, "deptrace0.proto.gz"))
+
+def run_points(configs, cpu_type, reuse=False):
+    """跑一组配置并解析结果，失败的为 None"""
+    rows = []
+    for config in configs:
+        path = stats_path(**config, cpu_type=cpu_type)
+        if not (reuse and os.path.exists(path)):
+            run_single_test(**config, cpu_type=cpu_type)
+        row = parse_file(path) if os.path.exists(path) else None
+        if row is None:
+            print(f"Warning: no stats for {path}")
+        rows.append(row)
+    return rows
+
+def fidelity(configs, replay_rows, full_rows, metrics):
+    """
+    逐点相对误差，以及每个指标的平均绝对误差和回放/完整运行之间的秩相关
+    返回 (逐点记录, 汇总记录)
+    """
+    points = []
+    both = [i for i in range(len(configs)) if replay_rows[i] and full_rows[i]]
+    for i in both:
+        record = {"Filename": os.path.basename(stats_path(**configs[i]))}
+        for m in metrics:
+            record["Error_" + m] = relative_delta(float(full_rows[i][m]), float(replay_rows[i][m]))
+        full_host = float(full_rows[i].get("Host_Seconds", 0))
+        replay_host = float(replay_rows[i].get("Host_Seconds", 0))
+        record["Speedup"] = full_host / replay_host if replay_host else None
+        points.append(record)
+
+    summary = []
+    for m in metrics:
+        errors = [abs(p["Error_" + m]) for p in points]
+        summary.append({
+            "Metric": m,
+            "Points": len(points),
+            "Mean_Abs_Error": sum(errors) / len(errors) if errors else None,
+            "Max_Abs_Error": max(errors, default=None),
+            "Spearman": spearman([float(full_rows[i][m]) for i in both],
+                                 [float(replay_rows[i][m]) for i in both]),
+        })
+    return points, summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture a memory trace once, replay it across cache-size/line-size sweeps")
+    parser.add_argument("--applications", type=str, nargs="+", default=["FFT", "bad_cache"])
+    parser.add_argument("--cpu-num", type=int, default=4)
+    parser.add_argument("--cache-sizes", type=int, nargs="+", default=CACHE_SIZES_KB)
+    parser.add_argument("--cacheline-sizes", type=int, nargs="+", default=CACHELINE_BYTES)
+    parser.add_argument("--validate", action="store_true",
+                        help="also run full o3 simulations of the same points and report replay error")
+    parser.add_argument("--metrics", type=str, nargs="+", default=FIDELITY_METRICS)
+    parser.add_argument("--reuse", action="store_true", help="skip runs whose trace/stats file already exists")
+    args = parser.parse_args()
+
+    report = []
+    summary = []
+    for application in args.applications:
+        print(f"\n=== {application}: capture ===")
+        if not capture(application, args.cpu_num, min(args.cacheline_sizes), max(args.cache_sizes), args.reuse):
+            print(f"Warning: trace capture failed for {application}, skipping")
+            continue
+
+        configs = replay_configs(application, args.cpu_num, args.cache_sizes, args.cacheline_sizes)
+        print(f"\n=== {application}: replay, {len(configs)} configs ===")
+        replay_rows = run_points(configs, "trace", args.reuse)
+
+        if not args.validate:
+            for config, row in zip(configs, replay_rows):
+                if row:
+                    report.append({"Filename": os.path.basename(stats_path(**config, cpu_type="trace")), **row})
+            continue
+
+        # 完整 O3 运行作为参照
+        print(f"\n=== {application}: full o3 validation ===")
+        full_rows = run_points(configs, "o3", args.reuse)
+        points, app_summary = fidelity(configs, replay_rows, full_rows, args.metrics)
+        for record in points:
+            report.append({"Application": application, **record})
+        for record in app_summary:
+            summary.append({"Application": application, **record})
+            rho = record["Spearman"]
+            mae = record["Mean_Abs_Error"]
+            print(f"  {record['Metric']:<32} mean |err| = {'n/a' if mae is None else f'{mae:.2%}'}"
+                  f"  spearman = {'n/a' if rho is None else f'{rho:+.3f}'}")
+
+    if not report:
+        print("No valid data found to process.")
+        return
+
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_file = os.path.join(RESULTS_DIR, f"replay-{current_time}.csv")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(report[0].keys()))
+        writer.writeheader()
+        for row in report:
+            writer.writerow(row)
+    print(f"\nReport successfully generated: {output_file}")
+
+    if summary:
+        summary_file = os.path.join(RESULTS_DIR, f"replay-{current_time}-fidelity.csv")
+        with open(summary_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary[0].keys()))
+            writer.writeheader()
+            for row in summary:
+                writer.writerow(row)
+        print(f"Replay fidelity: {summary_file}")
+        print("CHECK: a low SimSeconds Spearman means replay cannot rank cache configs for this application.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+import csv
+import math
+import random
+import argparse
+import datetime
+from env import *
+from analysis import parse_file
+from compare import rank_values, spearman
+from simulate_all import run_single_test, stats_path, sweep_configs
+
+# 粗筛阶段用于给配置排序的指标 (都是越小越好)
+# 选择一致性流量和片上网络指标，它们对 CPU 模型的精度不如 SimSeconds 敏感
+SCREEN_METRICS = [
+    "Write_Contention_Count",
+    "Coh_Invalidations",
+    "NoC_Flits_Injected",
+    "NoC_Control_Lat",
+    "NoC_Data_Lat",
+]
+# 计数类指标随指令数增长，排序前换算成每千条指令的次数
+PER_INSTRUCTION_METRICS = {"Write_Contention_Count", "Coh_Invalidations", "NoC_Flits_Injected"}
+
+def screen_value(row, metric):
+    value = float(row.get(metric, 0))
+    if metric in PER_INSTRUCTION_METRICS:
+        value = value / float(row.get("Total_Insts") or 1) * 1000
+    return value
+
+def run_stage(configs, cpu_type, reuse=False):
+    """用指定的 CPU 模型跑一遍配置列表，返回解析后的结果 (失败的为 None)"""
+    rows = []
+    for config in configs:
+        path = stats_path(**config, cpu_type=cpu_type)
+        if not (reuse and os.path.exists(path)):
+            run_single_test(**config, cpu_type=cpu_type)
+
+        row = parse_file(path) if os.path.exists(path) else None
+        if row is None:
+            print(f"Warning: no stats for {path}")
+        rows.append(row)
+    return rows
+
+def score_rows(rows, metrics):
+    """
+    在 CPU_Num 相同的点之间对每个指标分别排序 (核数不同的点一致性流量本来就不可比，
+    单核总是没有 FwdGetM/Inv)，秩 r 换算成百分位 r / (n + 1)，
+    点数少的组不会因为组内排第一就得到极端的分数，只有一个点时为 0.5
+    综合得分 = 各指标百分位的平均值 (越小越好)
+    不确定度 = 各指标百分位的标准差，指标之间意见越不一致，粗筛排序越不可信
+    返回 {下标: (得分, 不确定度)}
+    """
+    groups = {}
+    for i, row in enumerate(rows):
+        if row:
+            groups.setdefault(row.get("CPU_Num"), []).append(i)
+
+    scores = {}
+    for valid in groups.values():
+        metric_ranks = [rank_values([screen_value(rows[i], m) for i in valid]) for m in metrics]
+        for n, i in enumerate(valid):
+            ranks = [r[n] / (len(valid) + 1) for r in metric_ranks]
+            mean = sum(ranks) / len(ranks)
+            std = math.sqrt(sum((r - mean) ** 2 for r in ranks) / len(ranks))
+            scores[i] = (mean, std)
+    return scores
+
+def select_points(scores, top_k, uncertain):
+    """得分最好的 top_k 个点，加上剩余点中最不确定的 uncertain 个点"""
+    ordered = sorted(scores, key=lambda i: scores[i][0])
+    top = ordered[:top_k]
+    rest = sorted(ordered[top_k:], key=lambda i: scores[i][1], reverse=True)[:uncertain]
+    return top, rest
+
+def select_random(scores, exclude, count, seed=0):
+    """未被选中的点中随机抽 count 个做验证，它们的相关性不受粗筛排序的选择偏差影响"""
+    pool = sorted(i for i in scores if i not in exclude)
+    return sorted(random.Random(seed).sample(pool, min(count, len(pool))))
+
+def stage_correlation(points, fast_rows, fast_scores, detailed, metrics):
+    """
+    两个阶段在 points 上的秩相关
+    返回 (实际参与的点, {指标: spearman})
+    """
+    points = [i for i in points if i in detailed and fast_rows[i]]
+    detailed_scores = score_rows([detailed[i] for i in points], metrics)
+    pairs = {
+        "Screen_Score": ([fast_scores[i][0] for i in points],
+                         [detailed_scores[n][0] for n in range(len(points))]),
+        "SimSeconds": ([float(fast_rows[i]["SimSeconds"]) for i in points],
+                       [float(detailed[i]["SimSeconds"]) for i in points]),
+    }
+    for m in metrics:
+        pairs[m] = ([screen_value(fast_rows[i], m) for i in points],
+                    [screen_value(detailed[i], m) for i in points])
+    return points, {name: spearman(xs, ys) for name, (xs, ys) in pairs.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-stage sweep: cheap CPU screening, detailed CPU re-runs")
+    parser.add_argument("--applications", type=str, nargs="+", default=["FFT", "bad_cache"])
+    parser.add_argument("--fast-cpu", type=str, default="timing")
+    parser.add_argument("--detailed-cpu", type=str, default="o3")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--uncertain", type=int, default=2)
+    parser.add_argument("--validate-random", type=int, default=3,
+                        help="also re-run this many randomly sampled unselected points, reported as a separate set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", type=str, nargs="+", default=SCREEN_METRICS)
+    parser.add_argument("--reuse", action="store_true", help="skip runs whose stats file already exists")
+    args = parser.parse_args()
+
+    report = []
+    correlations = []
+
+    for application in args.applications:
+        configs = sweep_configs(application)
+
+        # 1. screening pass over the whole space
+        print(f"\n=== {application}: stage 1 ({args.fast_cpu}), {len(configs)} configs ===")
+        fast_rows = run_stage(configs, args.fast_cpu, args.reuse)
+        fast_scores = score_rows(fast_rows, args.metrics)
+        top, uncertain = select_points(fast_scores, args.top_k, args.uncertain)
+
+        # 2. detailed pass over the selected points, plus random validation points
+        selected = top + uncertain
+        validation = select_random(fast_scores, selected, args.validate_random, args.seed)
+        rerun = selected + validation
+        print(f"\n=== {application}: stage 2 ({args.detailed_cpu}), {len(rerun)} configs ===")
+        detailed_rows = run_stage([configs[i] for i in rerun], args.detailed_cpu, args.reuse)
+        detailed = {i: row for i, row in zip(rerun, detailed_rows) if row}
+
+        for i, config in enumerate(configs):
+            fast = fast_rows[i] or {}
+            slow = detailed.get(i, {})
+            record = {
+                "Application": application,
+                "Filename": os.path.basename(stats_path(**config, cpu_type=args.fast_cpu)),
+                "Selected": ("top" if i in top else "uncertain" if i in uncertain
+                             else "random" if i in validation else ""),
+                "Screen_Score": fast_scores.get(i, (None, None))[0],
+                "Screen_Uncertainty": fast_scores.get(i, (None, None))[1],
+                "Stage1_SimSeconds": fast.get("SimSeconds"),
+                "Stage2_SimSeconds": slow.get("SimSeconds"),
+            }
+            for m in args.metrics:
+                record["Stage1_" + m] = fast.get(m)
+                record["Stage2_" + m] = slow.get(m)
+            report.append(record)
+
+        # rank correlation between the two stages: the selected points are biased
+        # towards the best scores, the random points estimate it over the whole space
+        sets = [("selected", selected)]
+        if validation:
+            sets.append(("random", validation))
+        for set_name, points in sets:
+            points, rhos = stage_correlation(points, fast_rows, fast_scores, detailed, args.metrics)
+            for name, rho in rhos.items():
+                correlations.append({"Application": application, "Set": set_name, "Metric": name,
+                                     "Points": len(points), "Spearman": rho})
+                print(f"  [{set_name}] {name:<24} spearman = {'n/a' if rho is None else f'{rho:+.3f}'}"
+                      f" over {len(points)} points")
+
+    if not report:
+        print("No configurations were screened.")
+        return
+
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_file = os.path.join(RESULTS_DIR, f"screen-{current_time}.csv")
+    correlation_file = os.path.join(RESULTS_DIR, f"screen-{current_time}-correlation.csv")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(report[0].keys()))
+        writer.writeheader()
+        for row in report:
+            writer.writerow(row)
+    with open(correlation_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["Application", "Set", "Metric", "Points", "Spearman"])
+        writer.writeheader()
+        for row in correlations:
+            writer.writerow(row)
+
+    print(f"\nReport successfully generated: {output_file}")
+    print(f"Rank correlation: {correlation_file}")
+    print("CHECK: a low 'Screen_Score' Spearman means the cheap pass cannot be trusted for this application;"
+          " use the 'random' set (--validate-random) for an unbiased estimate.")
+
+if __name__ == "__main__":
+    main()
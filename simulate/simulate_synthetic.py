@@ -0,0 +1,118 @@
+import os
+import csv
+import argparse
+import datetime
+from env import *
+from analysis import format_synthetic_name, read_stats_metrics
+from metrics import MetricPlan
+
+# Garnet 网络统计 (合成流量实验只关心网络本身)
+SYNTHETIC_CATALOG = [
+    {"name": "Packets_Injected", "stat": "system.ruby.network.packets_injected::total", "reduce": "sum"},
+    {"name": "Packets_Received", "stat": "system.ruby.network.packets_received::total", "reduce": "sum"},
+    {"name": "Avg_Packet_Latency", "stat": "system.ruby.network.average_packet_latency", "reduce": "sum"},
+    {"name": "Avg_Network_Latency", "stat": "system.ruby.network.average_packet_network_latency", "reduce": "sum"},
+    {"name": "Avg_Queueing_Latency", "stat": "system.ruby.network.average_packet_queueing_latency", "reduce": "sum"},
+    {"name": "Avg_Hops", "stat": "system.ruby.network.average_hops", "reduce": "sum"},
+]
+
+DEFAULT_RATES = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, 0.6, 0.8, 1.0]
+
+def run_single_synthetic(topology, nodes, pattern, hop_latency, injection_rate, sim_cycles):
+    cmd = [
+        M5_SYNTHETIC_EXE_PATH,
+        SYNTHETIC_PATH,
+        "--topology", topology,
+        "--nodes", str(nodes),
+        "--pattern", pattern,
+        "--hop-latency", str(hop_latency),
+        "--injection-rate", str(injection_rate),
+        "--sim-cycles", str(sim_cycles)
+    ]
+
+    print(f"Running: {' '.join(cmd)}")
+    os.system(' '.join(cmd))
+
+def sweep_injection(plan, topology, nodes, pattern, hop_latency, rates, sim_cycles,
+                    saturation_factor, reuse=False):
+    """
+    从低到高扫描注入率，直到平均包延迟超过零负载延迟的 saturation_factor 倍
+    返回延迟-负载曲线上的点
+    """
+    curve = []
+    zero_load_latency = None
+    for rate in rates:
+        path = os.path.join(GENERATED_DIR, format_synthetic_name(topology, nodes, pattern, hop_latency, rate))
+        if not (reuse and os.path.exists(path)):
+            run_single_synthetic(topology, nodes, pattern, hop_latency, rate, sim_cycles)
+        if not os.path.exists(path):
+            print(f"Warning: no stats for {path}")
+            continue
+
+        stats = read_stats_metrics(path, plan)
+        if not stats:
+            continue
+        latency = stats["Avg_Packet_Latency"]
+        if zero_load_latency is None:
+            zero_load_latency = latency
+
+        saturated = bool(zero_load_latency) and latency > saturation_factor * zero_load_latency
+        curve.append({
+            "Network_Topology": topology,
+            "Nodes": nodes,
+            "Pattern": pattern,
+            "Network_Hop_Latency": hop_latency,
+            "Injection_Rate": rate,
+            # 接收率: 每个节点每周期收到的包数
+            "Throughput": stats["Packets_Received"] / nodes / sim_cycles,
+            **stats,
+            "Saturated": saturated,
+        })
+        print(f"  rate={rate:.3f} latency={latency:.2f} throughput={curve[-1]['Throughput']:.4f}"
+              + (" (saturated)" if saturated else ""))
+        if saturated:
+            break
+    return curve
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency-vs-load curves from Garnet synthetic traffic")
+    parser.add_argument("--topology", type=str, nargs="+", default=["mesh", "all2all"])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--pattern", type=str, nargs="+", default=["uniform_random", "transpose", "hotspot"])
+    parser.add_argument("--hop-latency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_RATES)
+    parser.add_argument("--sim-cycles", type=int, default=100000)
+    parser.add_argument("--saturation-factor", type=float, default=3.0,
+                        help="stop once latency exceeds this multiple of the zero-load latency")
+    parser.add_argument("--reuse", action="store_true", help="skip runs whose stats file already exists")
+    args = parser.parse_args()
+
+    plan = MetricPlan(SYNTHETIC_CATALOG)
+    results = []
+    for topology in args.topology:
+        for nodes in args.nodes:
+            for pattern in args.pattern:
+                for hop_latency in args.hop_latency:
+                    print(f"\n=== {topology} nodes={nodes} {pattern} hop={hop_latency} ===")
+                    results.extend(sweep_injection(
+                        plan, topology, nodes, pattern, hop_latency, sorted(args.rates),
+                        args.sim_cycles, args.saturation_factor, args.reuse
+                    ))
+
+    if not results:
+        print("No valid data found to process.")
+        return
+
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_file = os.path.join(RESULTS_DIR, f"synthetic-{current_time}.csv")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        for row in results:
+            writer.writerow(row)
+
+    print(f"\nReport successfully generated: {output_file}")
+
+if __name__ == "__main__":
+    main()
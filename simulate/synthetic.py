@@ -0,0 +1,212 @@
+# Garnet synthetic traffic on the same topologies as main.py.
+# Must run on a gem5 built with PROTOCOL=Garnet_standalone (M5_SYNTHETIC_EXE_PATH);
+# simulate_synthetic.py sweeps the injection rate and reports latency-vs-load.
+import m5
+from m5.objects import *
+
+import os
+import sys
+import math
+import shutil
+import argparse
+from env import *
+from analysis import format_synthetic_name
+sys.path.append(ROOT_DIR)
+
+from networks.all2all import All2AllNetwork
+from networks.mesh import MeshNetwork
+
+# traffic patterns -> (GarnetSyntheticTraffic traffic_type, hotspot)
+# hotspot sends every packet to the last node, where main.py places the directory
+TRAFFIC_PATTERNS = {
+    "uniform_random": ("uniform_random", False),
+    "transpose": ("transpose", False),
+    "hotspot": ("uniform_random", True),
+}
+
+class SyntheticRubySystem(RubySystem):
+    def setup(
+        self,
+        system,
+        testers,
+        network_topology: str = "mesh",
+        network_flit_size: int = 16,
+        network_hop_latency: int = 1,
+        block_size_bytes: int = 64,
+    ):
+        """One Garnet_standalone L1 and one directory slice per router."""
+        if network_topology == "all2all":
+            self.network = All2AllNetwork(self, flit_size=network_flit_size)
+        elif network_topology == "mesh":
+            self.network = MeshNetwork(self, flit_size=network_flit_size)
+        else:
+            raise Exception("invalid network topology type")
+
+        self.block_size_bytes = block_size_bytes
+
+        # Garnet_standalone uses 3 virtual networks
+        self.number_of_virtual_networks = 3
+        self.network.number_of_virtual_networks = 3
+
+        nodes = len(testers)
+        dir_bits = int(math.log(nodes, 2))
+        block_bits = int(math.log(block_size_bytes, 2))
+
+        self.l1_controllers = []
+        self.sequencers = []
+        for i in range(nodes):
+            cache = RubyCache(size="256B", assoc=2)
+            l1 = Garnet_standalone_L1Cache_Controller(
+                version=i, cacheMemory=cache, ruby_system=self
+            )
+            l1.sequencer = RubySequencer(
+                version=i, dcache=cache, garnet_standalone=True, ruby_system=self
+            )
+            l1.mandatoryQueue = MessageBuffer()
+            l1.requestFromCache = MessageBuffer()
+            l1.requestFromCache.out_port = self.network.in_port
+            l1.responseFromCache = MessageBuffer()
+            l1.responseFromCache.out_port = self.network.in_port
+            l1.forwardFromCache = MessageBuffer()
+            l1.forwardFromCache.out_port = self.network.in_port
+            self.l1_controllers.append(l1)
+            self.sequencers.append(l1.sequencer)
+
+        # directories interleaved at block granularity, so packet destination
+        # i (address i << block_bits) lands on the directory of router i
+        self.dir_controllers = []
+        for i in range(nodes):
+            directory = Garnet_standalone_Directory_Controller(
+                version=i,
+                directory=RubyDirectoryMemory(block_size=block_size_bytes),
+                addr_ranges=[AddrRange(
+                    start=0,
+                    size=system.mem_ranges[0].size(),
+                    intlvHighBit=block_bits + dir_bits - 1,
+                    intlvBits=dir_bits,
+                    intlvMatch=i,
+                )],
+                ruby_system=self,
+            )
+            directory.requestToDir = MessageBuffer()
+            directory.requestToDir.in_port = self.network.out_port
+            directory.forwardToDir = MessageBuffer()
+            directory.forwardToDir.in_port = self.network.out_port
+            directory.responseToDir = MessageBuffer()
+            directory.responseToDir.in_port = self.network.out_port
+            self.dir_controllers.append(directory)
+
+        self.controllers = self.l1_controllers + self.dir_controllers
+        self.num_of_sequencers = len(self.sequencers)
+
+        # the builders create one router per controller passed in; attach the
+        # L1s that way and hang each directory slice off the same router
+        self.network.connectControllers(
+            self.l1_controllers,
+            hop_latency=network_hop_latency
+        )
+        for i, directory in enumerate(self.dir_controllers):
+            ext_link = GarnetExtLink(
+                link_id=len(self.network.ext_links),
+                ext_node=directory,
+                int_node=self.network.routers[i],
+            )
+            ext_link.latency = 1
+            self.network.ext_links.append(ext_link)
+            self.network.netifs.append(
+                GarnetNetworkInterface(id=len(self.network.netifs))
+            )
+
+        # System::init() panics if the system port is left unconnected
+        self.sys_port_proxy = RubyPortProxy(ruby_system=self)
+        system.system_port = self.sys_port_proxy.in_ports
+
+        for tester, sequencer in zip(testers, self.sequencers):
+            tester.test = sequencer.in_ports
+
+def collect_stats(new_name: str):
+    destination_path = os.path.join(GENERATED_DIR, new_name)
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+    try:
+        shutil.move(M5_OUT_STATS_PATH, destination_path)
+        print(f"move: {M5_OUT_STATS_PATH} -> {destination_path}")
+    except Exception as e:
+        print(f"fail to move: {e}")
+
+def simulate_synthetic(
+    network_topology: str = "mesh",
+    nodes: int = 16,
+    pattern: str = "uniform_random",
+    injection_rate: float = 0.1,
+    network_hop_latency: int = 1,
+    network_flit_size: int = 16,
+    sim_cycles: int = 100000,
+):
+    if nodes & (nodes - 1):
+        raise Exception("synthetic traffic needs a power-of-two node count")
+    if pattern not in TRAFFIC_PATTERNS:
+        raise Exception("invalid traffic pattern")
+    traffic_type, hotspot = TRAFFIC_PATTERNS[pattern]
+
+    testers = [
+        GarnetSyntheticTraffic(
+            num_packets_max=-1,
+            sim_cycles=sim_cycles,
+            traffic_type=traffic_type,
+            inj_rate=injection_rate,
+            inj_vnet=-1,
+            precision=3,
+            num_dest=nodes,
+            single_dest=nodes - 1 if hotspot else -1,
+        )
+        for i in range(nodes)
+    ]
+
+    system = System(cpu=testers, mem_ranges=[AddrRange("256MiB")])
+    system.clk_domain = SrcClockDomain()
+    system.clk_domain.clock = "1GHz"
+    system.clk_domain.voltage_domain = VoltageDomain()
+    system.mem_mode = "timing"
+
+    system.ruby = SyntheticRubySystem()
+    system.ruby.setup(
+        system,
+        testers,
+        network_topology=network_topology,
+        network_flit_size=network_flit_size,
+        network_hop_latency=network_hop_latency,
+    )
+
+    root = Root(full_system=False, system=system)
+    m5.instantiate()
+
+    print("Beginning synthetic simulation!")
+    exit_event = m5.simulate()
+    print(f"Exiting @ tick {m5.curTick()} because {exit_event.getCause()}")
+
+    collect_stats(format_synthetic_name(
+        network_topology, nodes, pattern, network_hop_latency, injection_rate
+    ))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topology", type=str, default="mesh")
+    parser.add_argument("--nodes", type=int, default=16)
+    parser.add_argument("--pattern", type=str, default="uniform_random", choices=list(TRAFFIC_PATTERNS))
+    parser.add_argument("--injection-rate", type=float, default=0.1)
+    parser.add_argument("--hop-latency", type=int, default=1)
+    parser.add_argument("--flit-size", type=int, default=16)
+    parser.add_argument("--sim-cycles", type=int, default=100000)
+    args = parser.parse_args()
+
+    simulate_synthetic(
+        network_topology=args.topology,
+        nodes=args.nodes,
+        pattern=args.pattern,
+        injection_rate=args.injection_rate,
+        network_hop_latency=args.hop_latency,
+        network_flit_size=args.flit_size,
+        sim_cycles=args.sim_cycles,
+    )
+
+main()
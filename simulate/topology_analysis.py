@@ -0,0 +1,296 @@
+import os
+import io
+import sys
+import csv
+import types
+import argparse
+import datetime
+import contextlib
+from itertools import combinations
+from env import *
+
+# 离线分析拓扑: 用桩对象代替 m5.objects，直接运行 networks/ 下各网络的
+# connectControllers，从生成的路由器和链路中得到图结构，不需要运行 gem5
+
+class StubSimObject:
+    """只记录参数的 SimObject 替身"""
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+def install_m5_stub():
+    """在没有 gem5 的 Python 环境中注册一个最小的 m5.objects"""
+    try:
+        import m5.objects
+        return
+    except ImportError:
+        pass
+
+    objects = types.ModuleType("m5.objects")
+    for name in ["GarnetNetwork", "GarnetRouter", "GarnetNetworkInterface",
+                 "GarnetExtLink", "GarnetIntLink"]:
+        setattr(objects, name, type(name, (StubSimObject,), {}))
+    m5 = types.ModuleType("m5")
+    m5.objects = objects
+    sys.modules["m5"] = m5
+    sys.modules["m5.objects"] = objects
+
+def get_network_builders():
+    install_m5_stub()
+    sys.path.append(ROOT_DIR)
+    from networks.all2all import All2AllNetwork
+    from networks.mesh import MeshNetwork
+    return {"all2all": All2AllNetwork, "mesh": MeshNetwork}
+
+def build_network(topology, cpu_num, hop_latency=1, flit_size=16):
+    """
+    按 MyCacheSystem.setup 的方式构建网络: cpu_num 个 L1 控制器 + 1 个目录控制器
+    """
+    builders = get_network_builders()
+    if topology not in builders:
+        raise Exception("invalid network topology type")
+
+    controllers = [StubSimObject(name=f"L1Cache{i}") for i in range(cpu_num)]
+    controllers.append(StubSimObject(name="Directory"))
+
+    network = builders[topology](None, flit_size=flit_size)
+    # 网络构建时的打印信息在离线分析中没有意义
+    with contextlib.redirect_stdout(io.StringIO()):
+        network.connectControllers(controllers, hop_latency=hop_latency)
+    return network, controllers
+
+def extract_graph(network, controllers):
+    """
+    从网络对象中取出图结构
+    routers: {router_id: 延迟}
+    links: [(src_router, dst_router, 延迟, 链路宽度 bytes/cycle)]
+    Garnet 忽略 bandwidth_factor，链路每周期传输一个 flit，宽度取链路的 width，
+    没有设置时为网络的 ni_flit_size
+    attach: [(router_id, 外部链路延迟, 外部链路宽度 bytes/cycle)]，按控制器顺序
+    外部链路是控制器的网络接口与路由器之间的一对注入/弹出链路，同样每周期一个 flit
+    """
+    router_index = {id(r): r.router_id for r in network.routers}
+    routers = {r.router_id: getattr(r, "latency", 1) for r in network.routers}
+
+    flit_size = network.ni_flit_size
+    links = []
+    for link in network.int_links:
+        links.append((
+            router_index[id(link.src_node)],
+            router_index[id(link.dst_node)],
+            getattr(link, "latency", 1),
+            getattr(link, "width", None) or flit_size,
+        ))
+
+    ext_by_controller = {id(link.ext_node): link for link in network.ext_links}
+    attach = []
+    for controller in controllers:
+        link = ext_by_controller[id(controller)]
+        attach.append((
+            router_index[id(link.int_node)],
+            getattr(link, "latency", 1),
+            getattr(link, "width", None) or flit_size,
+        ))
+    return routers, links, attach
+
+def shortest_paths(routers, links):
+    """
+    所有路由器对之间的全部最短路径 (以内部链路数计)
+    返回 {(src, dst): [[link_index, ...], ...]}
+    """
+    out_links = {r: [] for r in routers}
+    for index, (src, dst, _, _) in enumerate(links):
+        out_links[src].append(index)
+
+    paths = {}
+    for src in routers:
+        # BFS 得到距离，再沿最短路 DAG 展开全部路径
+        dist = {src: 0}
+        frontier = [src]
+        while frontier:
+            next_frontier = []
+            for u in frontier:
+                for index in out_links[u]:
+                    v = links[index][1]
+                    if v not in dist:
+                        dist[v] = dist[u] + 1
+                        next_frontier.append(v)
+            frontier = next_frontier
+
+        found = {src: [[]]}
+        for u in sorted(dist, key=dist.get):
+            for index in out_links[u]:
+                v = links[index][1]
+                if dist.get(v) == dist[u] + 1:
+                    found.setdefault(v, []).extend(p + [index] for p in found[u])
+        for dst, dst_paths in found.items():
+            paths[(src, dst)] = dst_paths
+    return paths
+
+def traffic_pairs(pattern, num_controllers):
+    """
+    流量模式: [(源控制器, 目的控制器, 权重)]，每个源节点总注入率归一化为 1
+    uniform: 所有控制器两两之间均匀通信
+    directory: L1 只和目录通信 (请求与响应两个方向)，最后一个控制器是目录
+    """
+    if pattern == "uniform":
+        others = num_controllers - 1
+        return [(s, d, 1.0 / others) for s in range(num_controllers)
+                for d in range(num_controllers) if s != d] if others else []
+    if pattern == "directory":
+        directory = num_controllers - 1
+        pairs = [(s, directory, 1.0) for s in range(directory)]
+        if directory:
+            pairs += [(directory, d, 1.0 / directory) for d in range(directory)]
+        return pairs
+    raise Exception("invalid traffic pattern")
+
+def link_loads(links, attach, paths, pairs):
+    """
+    按最短路径均分流量，得到每条链路上的负载 (flit/cycle，每个源注入率为 1)
+    返回 (内部链路负载, 每个控制器注入链路负载, 每个控制器弹出链路负载)
+    """
+    loads = [0.0] * len(links)
+    injection = [0.0] * len(attach)
+    ejection = [0.0] * len(attach)
+    for s, d, weight in pairs:
+        route = paths.get((attach[s][0], attach[d][0]))
+        if route is None:
+            continue
+        injection[s] += weight
+        ejection[d] += weight
+        share = weight / len(route)
+        for path in route:
+            for index in path:
+                loads[index] += share
+    return loads, injection, ejection
+
+def bisection_bandwidth(routers, links):
+    """
+    最小均衡二分割上单方向的链路带宽 (bytes/cycle)
+    穷举所有均衡划分，路由器太多时返回 None
+    """
+    nodes = sorted(routers)
+    if len(nodes) < 2 or len(nodes) > 16:
+        return None
+
+    best = None
+    first, rest = nodes[0], nodes[1:]
+    for group in combinations(rest, len(nodes) // 2 - 1):
+        side = {first, *group}
+        forward = sum(width for src, dst, _, width in links if src in side and dst not in side)
+        backward = sum(width for src, dst, _, width in links if src not in side and dst in side)
+        cut = min(forward, backward)
+        best = cut if best is None else min(best, cut)
+    return best
+
+def analyze_topology(topology, cpu_num, hop_latency=1, flit_size=16):
+    """网络的静态图指标，供命令行报告和其他分析阶段使用"""
+    network, controllers = build_network(topology, cpu_num, hop_latency, flit_size)
+    routers, links, attach = extract_graph(network, controllers)
+    paths = shortest_paths(routers, links)
+
+    # 控制器之间的跳数 (经过的内部链路数) 和零负载延迟估计
+    hops = []
+    latencies = []
+    unreachable = 0
+    for s in range(len(attach)):
+        for d in range(len(attach)):
+            if s == d:
+                continue
+            route = paths.get((attach[s][0], attach[d][0]))
+            if route is None:
+                unreachable += 1
+                continue
+            path = route[0]
+            hops.append(len(path))
+            latencies.append(
+                attach[s][1] + attach[d][1]
+                + sum(links[i][2] for i in path)
+                + sum(routers[links[i][1]] for i in path) + routers[attach[s][0]]
+            )
+
+    result = {
+        "Network_Topology": topology,
+        "CPU_Num": cpu_num,
+        "Network_Hop_Latency": hop_latency,
+        "Network_Flit_Size": flit_size,
+        "Routers": len(routers),
+        "Int_Links": len(links),
+        "Ext_Links": len(attach),
+        "Max_Router_Radix": max(
+            sum(1 for l in links if l[0] == r) + sum(1 for a in attach if a[0] == r) for r in routers
+        ),
+        "Avg_Hops": sum(hops) / len(hops) if hops else 0,
+        "Diameter": max(hops) if hops else 0,
+        "Avg_ZeroLoad_Latency": sum(latencies) / len(latencies) if latencies else 0,
+        "Unreachable_Pairs": unreachable,
+        "Bisection_BW_Bytes": bisection_bandwidth(routers, links),
+    }
+
+    link_table = []
+    for pattern in ["uniform", "directory"]:
+        loads, injection, ejection = link_loads(links, attach, paths, traffic_pairs(pattern, len(attach)))
+        # (名称, 负载, 宽度)，内部链路之外还包括每个控制器的注入和弹出链路
+        all_links = [(f"{links[i][0]}->{links[i][1]}", load, links[i][3]) for i, load in enumerate(loads)]
+        all_links += [(f"ni{c}->{attach[c][0]}", load, attach[c][2]) for c, load in enumerate(injection)]
+        all_links += [(f"{attach[c][0]}->ni{c}", load, attach[c][2]) for c, load in enumerate(ejection)]
+        # 最忙链路 (任意类型) 决定饱和注入率: 链路每周期最多传输 width / flit_size 个 flit
+        max_load = max((load * flit_size / width for _, load, width in all_links), default=0)
+        result[f"Max_Link_Load_{pattern}"] = max_load
+        result[f"Saturation_Rate_{pattern}"] = 1 / max_load if max_load else None
+        for name, load, _ in all_links:
+            link_table.append({
+                "Network_Topology": topology,
+                "CPU_Num": cpu_num,
+                "Pattern": pattern,
+                "Link": name,
+                "Load": load,
+            })
+
+    return result, link_table
+
+def main():
+    parser = argparse.ArgumentParser(description="Static graph analysis of the Garnet network builders")
+    parser.add_argument("--topology", type=str, nargs="+", default=["mesh", "all2all"])
+    parser.add_argument("--cpu-num", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--hop-latency", type=int, default=1)
+    parser.add_argument("--flit-size", type=int, default=16)
+    parser.add_argument("--links", action="store_true", help="also write the per-link load table")
+    args = parser.parse_args()
+
+    results = []
+    link_rows = []
+    for topology in args.topology:
+        for cpu_num in args.cpu_num:
+            result, link_table = analyze_topology(
+                topology, cpu_num, args.hop_latency, args.flit_size
+            )
+            results.append(result)
+            link_rows.extend(link_table)
+            print(f"{topology:>8} cpu={cpu_num:<2} routers={result['Routers']:<3} links={result['Int_Links']:<3} "
+                  f"avg_hops={result['Avg_Hops']:.3f} diameter={result['Diameter']} "
+                  f"zero_load_lat={result['Avg_ZeroLoad_Latency']:.2f} "
+                  f"bisection={result['Bisection_BW_Bytes']} B/cycle "
+                  f"max_load(dir)={result['Max_Link_Load_directory']:.3f}")
+
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_file = os.path.join(RESULTS_DIR, f"topology-{current_time}.csv")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        for row in results:
+            writer.writerow(row)
+    print(f"\nReport successfully generated: {output_file}")
+
+    if args.links:
+        links_file = os.path.join(RESULTS_DIR, f"topology-{current_time}-links.csv")
+        with open(links_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(link_rows[0].keys()))
+            writer.writeheader()
+            for row in link_rows:
+                writer.writerow(row)
+        print(f"Per-link loads: {links_file}")
+
+if __name__ == "__main__":
+    main()